@@ -1,19 +1,583 @@
 #!/usr/bin/env python3
 """
 Simple server to handle saving word JSON files
+
+Development:  python server.py
+Production:   python server.py --production [--threads 8]   (waitress, multi-threaded)
+              gunicorn -w 4 -b 0.0.0.0:5000 server:app       (pre-forked workers)
+SQLite:       python server.py --db corpus.sqlite3           (or set WORDS_DB)
+Live editing: GET /api/changes?since=V returns the cells changed after corpus version V;
+              POST /api/cells applies cell edits made against a base version (409 on conflict)
+Profiling:    python server.py --profile-dir profiles        then add ?profile=1 to a request
+
+Request counts, latencies and payload sizes are exposed on /metrics (Prometheus text format).
 """
 
+import argparse
+import copy
+import gzip
+import hashlib
 import json
 import os
-from flask import Flask, request, jsonify, send_from_directory
+import sys
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import Flask, request, jsonify, send_from_directory, Response, g
 from flask_cors import CORS
 
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Data tools (word index, validator helpers) live next to the data they manage
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'resources', 'data'))
+from word_index import WordIndex, WORD_FILE_PATTERN
+from truth_matrix import TruthMatrix
+from corpus_db import CorpusDB, load_rule_files, rules_json_bytes, word_json_bytes
+from instrumentation import Metrics, SIZE_BUCKETS, start_cprofile
+from corpus_lint import CorpusLinter, default_cache_path as default_lint_cache_path
+from change_log import ChangeLog, ConflictError, default_log_path
+
 app = Flask(__name__)
 CORS(app)
 
 # Configuration
 WORDS_DIR = "src/resources/data/words_zh"
+RULES_DIR = "src/resources/data/rules_zh"
+# Serve from a corpus_db SQLite database instead of the JSON files when set
+WORDS_DB = os.environ.get('WORDS_DB')
 PORT = 5000
+# Seconds between directory polls for changed files
+REFRESH_INTERVAL = 1.0
+# Word/rule files change rarely but must show edits immediately: cache, but always
+# revalidate (a matching ETag costs a bodiless 304)
+DATA_CACHE_CONTROL = 'public, no-cache'
+API_CACHE_CONTROL = 'no-cache'
+DATA_PATH_PREFIXES = ('/src/resources/data/words_zh/', '/src/resources/data/rules_zh/')
+# Smaller JSON bodies are not worth compressing
+MIN_COMPRESS_SIZE = 1024
+COMPRESSED_CACHE_SIZE = 512
+# Directory for per-request cProfile dumps (?profile=1); profiling is off when unset
+PROFILE_DIR = os.environ.get('PROFILE_DIR')
+
+class IdFilter:
+    """Word IDs given as ranges; membership is a range check, so "1-100000000" costs nothing."""
+
+    def __init__(self, ranges):
+        self.ranges = ranges
+
+    def __contains__(self, word_id):
+        try:
+            word_id = int(word_id)
+        except (TypeError, ValueError):
+            return False
+        return any(start <= word_id <= end for start, end in self.ranges)
+
+def parse_id_filter(ids_str):
+    """Parse "1,3,5-8" into an IdFilter of word IDs."""
+    ranges = []
+    for part in ids_str.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        if '-' in part:
+            start, end = part.split('-', 1)
+            ranges.append((int(start), int(end)))
+        else:
+            ranges.append((int(part), int(part)))
+    return IdFilter(ranges)
+
+def validate_word_data(data, word_id):
+    """Return an error message if the word data is not saveable, else None."""
+    if not data:
+        return 'No data provided'
+    if not isinstance(data, dict) or 'id' not in data or 'word' not in data or 'questions' not in data:
+        return 'Invalid data structure'
+    # Ensure the word ID matches (handle both string and int IDs)
+    if str(data['id']) != str(word_id):
+        return 'Word ID mismatch'
+    if not isinstance(data['questions'], list) or not all(isinstance(q, dict) for q in data['questions']):
+        return 'questions must be a list of objects'
+    return None
+
+def write_file_atomic(filepath, raw):
+    """Write bytes to a temp file in the same directory, then rename it over filepath."""
+    directory = os.path.dirname(filepath) or '.'
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', suffix='.json', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+class DataStore:
+    """Process-wide in-memory copy of the word and rule JSON files.
+
+    Files are parsed once. refresh() re-stats both directories (at most once per
+    refresh_interval) and only re-reads files whose mtime or size changed. Changed
+    word files are also recorded in the persistent word index, if one is given.
+    A CorpusLinter, if given, is used to lint saved files, and a ChangeLog records
+    every changed cell, whether it was saved here or edited on disk.
+    """
+
+    def __init__(self, words_dir, rules_dir, word_index=None, refresh_interval=REFRESH_INTERVAL, linter=None,
+                 change_log=None):
+        self.words_dir = words_dir
+        self.rules_dir = rules_dir
+        self.word_index = word_index
+        self.linter = linter
+        self.change_log = change_log
+        self.refresh_interval = refresh_interval
+        self._lock = threading.RLock()
+        # Per thread: word files renamed into place during the current changes() block
+        self._local = threading.local()
+        self._last_refresh = None
+        # filename -> {'sig': (mtime_ns, size), 'raw': bytes, 'data': parsed JSON}
+        self._word_files = {}
+        self._rule_files = {}
+        self._words_by_id = {}
+        self._ids_by_word = {}
+        # Bumped whenever any word changes, so derived data knows when to rebuild
+        self.words_version = 0
+        self._matrix = None
+        self._matrix_version = None
+
+    def _scan(self, directory, files, prefix=''):
+        """Sync one directory into files; return the set of changed or removed filenames."""
+        changed = set()
+        seen = set()
+        for entry in os.scandir(directory):
+            name = entry.name
+            if not (name.startswith(prefix) and name.endswith('.json')) or not entry.is_file():
+                continue
+            seen.add(name)
+            stat = entry.stat()
+            sig = (stat.st_mtime_ns, stat.st_size)
+            cached = files.get(name)
+            if cached and cached['sig'] == sig:
+                continue
+            try:
+                with open(entry.path, 'rb') as f:
+                    raw = f.read()
+                data = json.loads(raw)
+            except (OSError, ValueError) as e:
+                print(f"Error reading {entry.path}: {str(e)}")
+                continue
+            files[name] = {'sig': sig, 'raw': raw, 'data': data}
+            changed.add(name)
+        for name in set(files) - seen:
+            del files[name]
+            changed.add(name)
+        return changed
+
+    def _index_word(self, filename):
+        word_id = filename[len('word_'):-len('.json')]
+        previous = self._words_by_id.get(word_id)
+        if isinstance(previous, dict) and self._ids_by_word.get(previous.get('word')) == word_id:
+            del self._ids_by_word[previous['word']]
+        data = self._word_files[filename]['data']
+        self._words_by_id[word_id] = data
+        if isinstance(data, dict) and data.get('word'):
+            self._ids_by_word[data['word']] = word_id
+
+    def _reindex_words(self):
+        self._words_by_id = {}
+        self._ids_by_word = {}
+        for name in self._word_files:
+            self._index_word(name)
+
+    def refresh(self, force=False):
+        """Pick up files changed on disk since the last poll."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_refresh is not None and now - self._last_refresh < self.refresh_interval:
+                return
+            self._last_refresh = now
+            changed = self._scan(self.words_dir, self._word_files, prefix='word_')
+            if changed:
+                self._reindex_words()
+                self._record_in_index(changed)
+                self.words_version += 1
+            self._scan(self.rules_dir, self._rule_files)
+        if changed:
+            self._record_changes(changed, check_disk=True)
+
+    @contextmanager
+    def changes(self):
+        """Context for a write that must not interleave with other writers, in any process.
+
+        Saves inside it are logged when the outermost block ends. If it fails, the log
+        rolls back but files already renamed stay changed, so their cached signatures
+        are dropped and the next refresh reads and logs them.
+        """
+        if self.change_log is None or getattr(self._local, 'written', None) is not None:
+            yield
+            return
+        self._local.written = []
+        try:
+            with self.change_log.transaction():
+                yield
+        except BaseException:
+            with self._lock:
+                for filename in self._local.written:
+                    if filename in self._word_files:
+                        self._word_files[filename]['sig'] = None
+                self._last_refresh = None
+            raise
+        finally:
+            self._local.written = None
+
+    def _record_changes(self, filenames, check_disk=False):
+        """Log the current cells of some word files in the change log.
+
+        Always logs what is in memory, inside the log's write transaction, so the
+        log cannot go back to an older state than a concurrent save wrote. With
+        check_disk, files that changed again since they were read are left for the
+        next refresh (another process may have saved and logged them already).
+        """
+        if self.change_log is None:
+            return
+        with self.change_log.transaction(), self._lock:
+            words = []
+            for filename in filenames:
+                match = WORD_FILE_PATTERN.match(filename)
+                if not match:
+                    continue
+                entry = self._word_files.get(filename)
+                if check_disk:
+                    try:
+                        stat = os.stat(os.path.join(self.words_dir, filename))
+                        sig = (stat.st_mtime_ns, stat.st_size)
+                    except FileNotFoundError:
+                        sig = None
+                    if sig != (entry['sig'] if entry else None):
+                        continue
+                if entry is None:
+                    words.append((match.group(1), None, None))
+                elif isinstance(entry['data'], dict):
+                    words.append((match.group(1), entry['raw'], entry['data']))
+            self.change_log.record_words(words)
+
+    def _record_in_index(self, filenames):
+        if self.word_index is None:
+            return
+        for filename in filenames:
+            match = WORD_FILE_PATTERN.match(filename)
+            if match:
+                self.word_index.record_file(int(match.group(1)))
+
+    def word_filenames(self):
+        self.refresh()
+        with self._lock:
+            return list(self._word_files)
+
+    def get_word(self, word_id):
+        self.refresh()
+        with self._lock:
+            return self._words_by_id.get(str(word_id))
+
+    def get_word_id(self, word):
+        """Look up a word ID by its text."""
+        self.refresh()
+        with self._lock:
+            return self._ids_by_word.get(word)
+
+    def all_words(self, ids=None):
+        """Return word data sorted by ID, optionally limited to string IDs in ids (a set or IdFilter)."""
+        self.refresh()
+        with self._lock:
+            items = [(word_id, data) for word_id, data in self._words_by_id.items()
+                     if ids is None or word_id in ids]
+        items.sort(key=lambda item: int(item[0]) if item[0].isdigit() else 0)
+        return [data for _, data in items]
+
+    def get_word_file(self, filename):
+        """Raw bytes of a word file, or None if it is not known."""
+        self.refresh()
+        with self._lock:
+            entry = self._word_files.get(filename)
+            return entry['raw'] if entry else None
+
+    def get_rule_file(self, filename):
+        """Raw bytes of a rule file, or None if it is not known."""
+        self.refresh()
+        with self._lock:
+            entry = self._rule_files.get(filename)
+            return entry['raw'] if entry else None
+
+    def save_word(self, word_id, data):
+        """Write a word file atomically and update the store in the same step.
+
+        The change is logged before the file is renamed into place, inside the log's
+        transaction: if logging fails the file is untouched, and if the write fails
+        the log entry is rolled back.
+        """
+        filename = f"word_{int(word_id)}.json"
+        filepath = os.path.join(self.words_dir, filename)
+        raw = word_json_bytes(data)
+        with self.changes():
+            if self.change_log is not None:
+                self.change_log.record_words([(int(word_id), raw, data)])
+            with self._lock:
+                write_file_atomic(filepath, raw)
+                if getattr(self._local, 'written', None) is not None:
+                    self._local.written.append(filename)
+                stat = os.stat(filepath)
+                self._word_files[filename] = {'sig': (stat.st_mtime_ns, stat.st_size), 'raw': raw, 'data': data}
+                self._index_word(filename)
+                self._record_in_index([filename])
+                self.words_version += 1
+        return filename
+
+    def rule_ids(self):
+        """Ids of every rule in the rule files."""
+        self.refresh()
+        with self._lock:
+            return {r['id'] for entry in self._rule_files.values() if isinstance(entry['data'], dict)
+                    for r in entry['data'].get('rules', []) if isinstance(r, dict) and 'id' in r}
+
+    def truth_matrix(self):
+        """TruthMatrix of the current words, rebuilt only after a word changed."""
+        self.refresh()
+        with self._lock:
+            if self._matrix_version != self.words_version:
+                self._matrix = TruthMatrix.from_words(
+                    [d for d in self._words_by_id.values() if isinstance(d, dict) and 'id' in d]
+                )
+                self._matrix_version = self.words_version
+            return self._matrix
+
+class SQLiteDataStore:
+    """DataStore interface backed by a CorpusDB.
+
+    Word and rule "files" are rendered from the database in the JSON corpus layout,
+    so the editor and game routes behave the same on either backend.
+    """
+
+    def __init__(self, db, rules_dir=RULES_DIR, change_log=None):
+        self.db = db
+        self.word_index = None
+        # The linter checks word files; the database schema already enforces their shape
+        self.linter = None
+        self.change_log = change_log
+        # Database version the change log was last brought up to date with
+        self._logged_version = None
+        # Rule file names come from rules_index.json, e.g. context_rules.json -> context
+        self._rule_types_by_file = {filename: rule_type
+                                    for rule_type, (filename, _) in load_rule_files(rules_dir).items()}
+        self._matrix = None
+        self._matrix_version = None
+
+    @property
+    def words_version(self):
+        return self.db.version()
+
+    def refresh(self, force=False):
+        """Reads always go to the database; only the change log may need catching up.
+
+        Writes from other processes (e.g. validator.py --db) bump the database
+        version, and then every word is diffed against the log.
+        """
+        if self.change_log is None or self.db.version() == self._logged_version:
+            return
+        with self.change_log.transaction():
+            version = self.db.version()
+            if version == self._logged_version:
+                return
+            words = [(d['id'], word_json_bytes(d), d) for d in self.db.all_words()]
+            present = {int(word_id) for word_id, _, _ in words}
+            words += [(word_id, None, None) for word_id in self.change_log.word_ids() if word_id not in present]
+            self.change_log.record_words(words)
+            self._logged_version = version
+
+    @contextmanager
+    def changes(self):
+        if self.change_log is None:
+            yield
+            return
+        try:
+            with self.change_log.transaction():
+                yield
+        except BaseException:
+            # The database keeps words saved before the failure; refresh() diffs them into the log
+            self._logged_version = None
+            raise
+
+    def word_filenames(self):
+        return [f"word_{word_id}.json" for word_id in self.db.word_ids()]
+
+    def get_word(self, word_id):
+        return self.db.get_word(word_id)
+
+    def get_word_id(self, word):
+        word_id = self.db.get_word_id(word)
+        return str(word_id) if word_id is not None else None
+
+    def all_words(self, ids=None):
+        return self.db.all_words(ids)
+
+    def get_word_file(self, filename):
+        match = WORD_FILE_PATTERN.match(filename)
+        data = self.db.get_word(int(match.group(1))) if match else None
+        return word_json_bytes(data) if data else None
+
+    def get_rule_file(self, filename):
+        rule_type = self._rule_types_by_file.get(filename)
+        return rules_json_bytes(self.db.get_rules(rule_type)) if rule_type else None
+
+    def rule_ids(self):
+        return {r['id'] for r in self.db.get_rules()}
+
+    def save_word(self, word_id, data):
+        with self.changes():
+            before = self.db.version()
+            self.db.save_word(data)
+            if self.change_log is not None:
+                data = self.db.get_word(word_id)
+                self.change_log.record_words([(word_id, word_json_bytes(data), data)])
+                # Skip the full diff in refresh() unless another writer got in between
+                if before == self._logged_version and self.db.version() == before + 1:
+                    self._logged_version = before + 1
+        return f"word_{int(word_id)}.json"
+
+    def truth_matrix(self):
+        version = self.db.version()
+        if self._matrix_version != version:
+            self._matrix = TruthMatrix.from_words(self.db.all_words())
+            self._matrix_version = version
+        return self._matrix
+
+def create_store(db_path=None):
+    if db_path:
+        return SQLiteDataStore(CorpusDB(db_path), change_log=ChangeLog(default_log_path(db_path)))
+    return DataStore(WORDS_DIR, RULES_DIR, WordIndex(WORDS_DIR),
+                     linter=CorpusLinter(WORDS_DIR, RULES_DIR, default_lint_cache_path(WORDS_DIR), workers=1),
+                     change_log=ChangeLog(default_log_path(WORDS_DIR)))
+
+# Created by the first request (or by __main__ once --db is known), so importing the
+# module never builds a store that is then replaced
+store = None
+_store_lock = threading.Lock()
+
+def ensure_store():
+    global store
+    if store is None:
+        with _store_lock:
+            if store is None:
+                store = create_store(WORDS_DB)
+    return store
+
+metrics = Metrics()
+metrics.counter('http_requests_total', 'Requests by endpoint, method and status code.')
+metrics.histogram('http_request_duration_seconds', 'Request latency by endpoint and method.')
+metrics.histogram('http_request_size_bytes', 'Request body size by endpoint.', SIZE_BUCKETS)
+metrics.histogram('http_response_size_bytes', 'Response body size as sent (after compression) by endpoint.', SIZE_BUCKETS)
+metrics.counter('http_request_errors_total', 'Responses with a 5xx status by endpoint.')
+metrics.gauge('words_store_version', 'Change counter of the word data; increases on every save or file change.')
+
+def endpoint_label():
+    """The matched route pattern, so per-file URLs share one series."""
+    return request.url_rule.rule if request.url_rule else 'unmatched'
+
+@app.before_request
+def open_store():
+    ensure_store()
+
+@app.before_request
+def start_request_timer():
+    g.request_start = time.perf_counter()
+    if PROFILE_DIR and request.args.get('profile') == '1':
+        g.profiler = start_cprofile()
+
+@app.after_request
+def record_request_metrics(response):
+    """Count and time the request; runs after compression, so sizes are what went over the wire."""
+    endpoint = endpoint_label()
+    metrics.inc('http_requests_total', endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.observe('http_request_duration_seconds', time.perf_counter() - g.request_start,
+                    endpoint=endpoint, method=request.method)
+    if request.content_length:
+        metrics.observe('http_request_size_bytes', request.content_length, endpoint=endpoint)
+    if response.content_length is not None:
+        metrics.observe('http_response_size_bytes', response.content_length, endpoint=endpoint)
+    if response.status_code >= 500:
+        metrics.inc('http_request_errors_total', endpoint=endpoint)
+    if g.get('profiler') is not None:
+        g.profiler.disable()
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        name = f"{time.strftime('%Y%m%d-%H%M%S')}-{request.endpoint or 'unmatched'}-{threading.get_ident()}.prof"
+        g.profiler.dump_stats(os.path.join(PROFILE_DIR, name))
+        response.headers['X-Profile'] = name
+    return response
+
+# (etag, encoding) -> compressed body, so unchanged files are compressed once
+_compressed_cache = OrderedDict()
+_compressed_lock = threading.Lock()
+
+def negotiate_encoding():
+    """Pick br or gzip from Accept-Encoding (?gzip=1 forces gzip), or None."""
+    accepted = request.headers.get('Accept-Encoding', '').lower()
+    if brotli is not None and 'br' in accepted:
+        return 'br'
+    if 'gzip' in accepted or request.args.get('gzip') == '1':
+        return 'gzip'
+    return None
+
+def compress_body(body, encoding, etag):
+    key = (etag, encoding)
+    with _compressed_lock:
+        if key in _compressed_cache:
+            _compressed_cache.move_to_end(key)
+            return _compressed_cache[key]
+    if encoding == 'br':
+        compressed = brotli.compress(body)
+    else:
+        compressed = gzip.compress(body)
+    with _compressed_lock:
+        _compressed_cache[key] = compressed
+        if len(_compressed_cache) > COMPRESSED_CACHE_SIZE:
+            _compressed_cache.popitem(last=False)
+    return compressed
+
+@app.after_request
+def add_caching_and_compression(response):
+    """Strong ETag, 304 handling, cache headers and br/gzip for JSON GET/HEAD responses."""
+    if (request.method not in ('GET', 'HEAD') or response.status_code != 200 or response.direct_passthrough
+            or response.mimetype != 'application/json' or 'Content-Encoding' in response.headers):
+        return response
+    body = response.get_data()
+    encoding = negotiate_encoding() if len(body) >= MIN_COMPRESS_SIZE else None
+    # Each encoding is a different representation, so it gets its own strong ETag
+    etag = hashlib.sha1(body).hexdigest()
+    if encoding:
+        etag = f"{etag}-{encoding}"
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    if request.path.startswith(DATA_PATH_PREFIXES):
+        response.headers['Cache-Control'] = DATA_CACHE_CONTROL
+    else:
+        response.headers['Cache-Control'] = API_CACHE_CONTROL
+    response.make_conditional(request)
+    if response.status_code == 304 or not encoding:
+        return response
+    response.set_data(compress_body(body, encoding, etag))
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+@app.route('/metrics')
+def serve_metrics():
+    """Prometheus scrape endpoint. Error rate: http_requests_total{status=~"5.."} or http_request_errors_total."""
+    metrics.set('words_store_version', store.words_version)
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -21,42 +585,224 @@ def index():
 
 @app.route('/src/resources/data/words_zh/<filename>')
 def serve_word_file(filename):
-    return send_from_directory(WORDS_DIR, filename)
+    raw = store.get_word_file(filename)
+    if raw is None:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(raw, mimetype='application/json')
 
 @app.route('/src/resources/data/rules_zh/<filename>')
 def serve_rule_file(filename):
-    return send_from_directory("src/resources/data/rules_zh", filename)
+    raw = store.get_rule_file(filename)
+    if raw is None:
+        return jsonify({'error': 'Not found'}), 404
+    return Response(raw, mimetype='application/json')
+
+def lint_saved(filenames):
+    """Lint issues for just-saved word files; a lint failure never fails the save."""
+    if store.linter is None:
+        return []
+    try:
+        return store.linter.lint(filenames)['issues']
+    except Exception as e:
+        print(f"Error linting {', '.join(filenames)}: {str(e)}")
+        return []
+
+def parse_base_version(value):
+    """A baseVersion argument as an int (None if absent); raises ValueError if malformed."""
+    if value is None:
+        return None
+    if isinstance(value, bool) or not str(value).isdigit():
+        raise ValueError(f'Invalid baseVersion: {value}')
+    return int(value)
+
+def check_base_version(words, base_version):
+    """Raise ConflictError if a cell of these words changed after base_version (no-op without one).
+
+    Call inside store.changes(), so the check and the save are one step for every writer.
+    """
+    if base_version is None or store.change_log is None:
+        return
+    store.refresh(force=True)
+    store.change_log.check_cells(
+        [(w['id'], q['ruleId']) for w in words for q in w['questions']
+         if isinstance(q, dict) and isinstance(q.get('ruleId'), int)],
+        base_version
+    )
+
+def conflict_response(error):
+    if error.conflicts:
+        message = 'Conflict: cells changed since the base version'
+    else:
+        message = 'Base version is older than the change history; reload'
+    return jsonify({'error': message, 'version': error.version, 'conflicts': error.conflicts}), 409
+
+def corpus_version():
+    return store.change_log.version() if store.change_log else None
 
 @app.route('/api/save-word/<int:word_id>', methods=['POST'])
 def save_word(word_id):
+    """Save a whole word; with ?baseVersion=V, rejected with 409 if any of its cells changed after V"""
     try:
         # Get the JSON data from the request
         data = request.get_json()
         
-        if not data:
-            print(f"Error: No data provided for word {word_id}")
-            return jsonify({'error': 'No data provided'}), 400
+        error = validate_word_data(data, word_id)
+        if error:
+            print(f"Error: {error} for word {word_id}")
+            return jsonify({'error': error}), 400
+        try:
+            base_version = parse_base_version(request.args.get('baseVersion'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Write the JSON file and update the in-memory store
+        with store.changes():
+            check_base_version([data], base_version)
+            filename = store.save_word(word_id, data)
+        
+        return jsonify({'success': True, 'message': f'Successfully saved {filename}', 'version': corpus_version(),
+                        'lint': lint_saved([filename])})
+        
+    except ConflictError as e:
+        return conflict_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/save-words', methods=['POST'])
+def save_words():
+    """Save many words in one request: {"words": [{id, word, questions}, ...], "baseVersion": V (optional)}"""
+    try:
+        data = request.get_json()
+        words = data.get('words') if isinstance(data, dict) else None
+        
+        if not words or not isinstance(words, list):
+            return jsonify({'error': 'No words provided'}), 400
+        try:
+            base_version = parse_base_version(data.get('baseVersion'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Validate every word before writing anything
+        errors = {}
+        for word_data in words:
+            word_id = word_data.get('id') if isinstance(word_data, dict) else None
+            if word_id is None or not str(word_id).isdigit():
+                errors[str(word_id)] = 'Invalid word ID'
+                continue
+            error = validate_word_data(word_data, word_id)
+            if error:
+                errors[str(word_id)] = error
+        
+        if errors:
+            print(f"Error: batch save rejected: {errors}")
+            return jsonify({'error': 'Invalid words in batch', 'errors': errors}), 400
         
-        # Validate the data structure
-        if 'id' not in data or 'word' not in data or 'questions' not in data:
-            print(f"Error: Invalid data structure for word {word_id}. Data keys: {data.keys() if data else 'None'}")
-            return jsonify({'error': 'Invalid data structure'}), 400
+        # One change-log transaction: the batch is a single corpus version
+        saved = []
+        with store.changes():
+            check_base_version(words, base_version)
+            for word_data in words:
+                saved.append(store.save_word(word_data['id'], word_data))
         
-        # Ensure the word ID matches (handle both string and int IDs)
-        if str(data['id']) != str(word_id):
-            print(f"Error: Word ID mismatch for word {word_id}. Expected: {word_id}, Got: {data['id']}")
-            return jsonify({'error': 'Word ID mismatch'}), 400
+        return jsonify({'success': True, 'saved': saved, 'message': f'Successfully saved {len(saved)} files',
+                        'version': corpus_version(), 'lint': lint_saved(saved)})
         
-        # Create the filename
-        filename = f"word_{word_id}.json"
-        filepath = os.path.join(WORDS_DIR, filename)
+    except ConflictError as e:
+        return conflict_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def validate_cell(cell, rule_ids):
+    """Return an error message if a cell edit is malformed or names a rule not in rule_ids, else None."""
+    if not isinstance(cell, dict):
+        return 'Invalid cell'
+    if not str(cell.get('wordId', '')).isdigit():
+        return 'Invalid wordId'
+    if not isinstance(cell.get('ruleId'), int) or isinstance(cell.get('ruleId'), bool):
+        return 'Invalid ruleId'
+    if cell['ruleId'] not in rule_ids:
+        return 'Unknown ruleId'
+    if not isinstance(cell.get('result'), bool):
+        return 'result must be true or false'
+    if 'reason' in cell and not isinstance(cell['reason'], str):
+        return 'reason must be a string'
+    return None
+
+@app.route('/api/cells', methods=['POST'])
+def patch_cells():
+    """Edit single answers: {"baseVersion": V, "cells": [{"wordId", "ruleId", "result", "reason"?}, ...]}
+
+    All or nothing: if any cell changed after V, nothing is written and the 409
+    response carries the current value of each conflicting cell. Other cells of the
+    same words may have changed; they are kept, not overwritten.
+    """
+    try:
+        data = request.get_json()
+        cells = data.get('cells') if isinstance(data, dict) else None
+        if not cells or not isinstance(cells, list):
+            return jsonify({'error': 'No cells provided'}), 400
+        try:
+            base_version = parse_base_version(data.get('baseVersion'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if base_version is None:
+            return jsonify({'error': 'No baseVersion provided'}), 400
+        errors = {}
+        rule_ids = store.rule_ids()
+        for n, cell in enumerate(cells):
+            error = validate_cell(cell, rule_ids)
+            if error:
+                errors[str(n)] = error
+        if errors:
+            return jsonify({'error': 'Invalid cells', 'errors': errors}), 400
         
-        # Write the JSON file
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
+        edits = {}
+        for cell in cells:
+            edits.setdefault(str(int(cell['wordId'])), []).append(cell)
         
-        return jsonify({'success': True, 'message': f'Successfully saved {filename}'})
+        saved = []
+        with store.changes():
+            store.refresh(force=True)
+            store.change_log.check_cells([(c['wordId'], c['ruleId']) for c in cells], base_version)
+            words = {word_id: store.get_word(word_id) for word_id in edits}
+            missing = [word_id for word_id, word in words.items() if not isinstance(word, dict)]
+            if missing:
+                return jsonify({'error': f"Unknown words: {', '.join(missing)}"}), 404
+            for word_id, word_edits in edits.items():
+                word = copy.deepcopy(words[word_id])
+                questions = {q.get('ruleId'): q for q in word['questions'] if isinstance(q, dict)}
+                for cell in word_edits:
+                    question = questions.get(cell['ruleId'])
+                    if question is None:
+                        question = questions[cell['ruleId']] = {'ruleId': cell['ruleId']}
+                        word['questions'].append(question)
+                    question['result'] = cell['result']
+                    if 'reason' in cell:
+                        question['reason'] = cell['reason']
+                saved.append(store.save_word(word_id, word))
         
+        return jsonify({'success': True, 'version': corpus_version(), 'saved': saved, 'lint': lint_saved(saved)})
+    
+    except ConflictError as e:
+        return conflict_response(e)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/changes')
+def get_changes():
+    """Cells and words changed after a corpus version: /api/changes?since=V
+
+    With "reset": true the history no longer reaches back to V; reload /api/words/all.
+    """
+    try:
+        since = parse_base_version(request.args.get('since'))
+    except ValueError:
+        return jsonify({'error': 'Invalid since version'}), 400
+    if since is None:
+        return jsonify({'error': 'No since version provided'}), 400
+    try:
+        store.refresh()
+        return jsonify(store.change_log.changes_since(since))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -64,16 +810,90 @@ def save_word(word_id):
 def list_words():
     """List all available word files"""
     try:
-        files = []
-        for filename in os.listdir(WORDS_DIR):
-            if filename.startswith('word_') and filename.endswith('.json'):
-                files.append(filename)
-        return jsonify({'files': files})
+        return jsonify({'files': store.word_filenames()})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/words/lookup')
+def lookup_word():
+    """Find a word's ID by its text: /api/words/lookup?word=..."""
+    word = request.args.get('word')
+    if not word:
+        return jsonify({'error': 'No word provided'}), 400
+    word_id = store.word_index.lookup(word) if store.word_index else store.get_word_id(word)
+    if word_id is None:
+        return jsonify({'error': 'Word not found'}), 404
+    return jsonify({'word': word, 'id': str(word_id)})
+
+@app.route('/api/words/all')
+def get_all_words():
+    """Return every word in one response, optionally filtered with ?ids=1,3,5-8"""
+    try:
+        ids_filter = None
+        if request.args.get('ids'):
+            try:
+                ids_filter = parse_id_filter(request.args['ids'])
+            except ValueError:
+                return jsonify({'error': 'Invalid ids filter'}), 400
+        
+        # Version first: a client replaying changes after it only re-applies what it already has.
+        # The forced refresh then reads every save logged up to that version, including other
+        # processes' (their files are renamed into place before their log entries commit).
+        store.refresh()
+        version = corpus_version()
+        store.refresh(force=True)
+        return jsonify({'version': version, 'words': store.all_words(ids_filter)})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/lint')
+def lint_corpus():
+    """Lint report for the whole corpus; only files changed since the last run are re-checked"""
+    if store.linter is None:
+        return jsonify({'error': 'Linting needs the JSON word files (not available with --db)'}), 404
+    try:
+        return jsonify(store.linter.lint())
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/query')
+def query_words():
+    """Words matching a rule expression: /api/query?expr=12 AND NOT 77 AND 130[&count=1]"""
+    expression = request.args.get('expr')
+    if not expression:
+        return jsonify({'error': 'No expression provided'}), 400
+    try:
+        matrix = store.truth_matrix()
+        if request.args.get('count') == '1':
+            return jsonify({'expr': expression, 'count': matrix.count(expression)})
+        matches = matrix.query(expression)
+        return jsonify({'expr': expression, 'count': len(matches), 'words': matches})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
-    print(f"Starting server on port {PORT}")
-    print(f"Words directory: {WORDS_DIR}")
-    print(f"Open http://localhost:{PORT} in your browser")
-    app.run(host='0.0.0.0', port=PORT, debug=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Serve the word data and the interactive rules table.')
+    parser.add_argument('--production', action='store_true', help='Serve with waitress instead of the Flask debug server')
+    parser.add_argument('--host', default='0.0.0.0', help='Interface to bind')
+    parser.add_argument('--port', type=int, default=PORT, help='Port to listen on')
+    parser.add_argument('--threads', type=int, default=8, help='Worker threads in production mode')
+    parser.add_argument('--db', default=WORDS_DB, help='Serve from a corpus_db SQLite database instead of the JSON files')
+    parser.add_argument('--profile-dir', default=PROFILE_DIR, help='Allow ?profile=1 and write a cProfile dump per profiled request here')
+    args = parser.parse_args()
+    PROFILE_DIR = args.profile_dir
+    
+    store = create_store(args.db)
+    
+    print(f"Starting server on port {args.port}")
+    print(f"Words: {args.db or WORDS_DIR}")
+    print(f"Open http://localhost:{args.port} in your browser")
+    if args.production:
+        try:
+            from waitress import serve
+        except ImportError:
+            sys.exit("Production mode needs waitress: pip install waitress (or run: gunicorn -w 4 server:app)")
+        serve(app, host=args.host, port=args.port, threads=args.threads)
+    else:
+        app.run(host=args.host, port=args.port, debug=True) 
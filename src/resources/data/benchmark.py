@@ -0,0 +1,392 @@
+"""
+Benchmark suite for the server, the validator's parsing and saving, word lookups
+and the query layers, run against synthetic corpora (see synthetic_corpus.py).
+
+Each case is timed over several repeats and reported as seconds per operation
+(median, mean, min, p95). Results are written as JSON so runs can be compared:
+
+    python benchmark.py --words 1000 10000 --output bench.json
+    python benchmark.py --words 1000 10000 --compare bench.json --threshold 0.2
+
+--compare prints the change in median for every case found in both files and
+exits with status 1 if any case got slower by more than the threshold.
+Generated corpora are kept in --corpus-root and reused by later runs.
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+
+import synthetic_corpus
+import validator
+from change_log import ChangeLog
+from corpus_db import CorpusDB, load_rule_files
+from puzzle_generator import region_counts
+from truth_matrix import TruthMatrix
+from word_index import WordIndex
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(DATA_DIR)))
+DEFAULT_CORPUS_ROOT = os.path.join(tempfile.gettempdir(), 'things_in_rings_bench')
+GROUPS = ['server', 'validator', 'lookup', 'matrix', 'db']
+# Walking and parsing every word file is O(words) per call; above this size it runs once
+SCAN_REPEAT_LIMIT = 20000
+# Whole-corpus responses are timed sequentially; under load they would dominate the run
+BULK_ENDPOINTS = {"GET /api/words/all", "GET /api/words/all gzip"}
+
+
+def measure(fn, repeat=5, number=1):
+    """Seconds per call of fn over repeat rounds of number calls each.
+
+    The functions under test print progress; that output is discarded.
+    """
+    samples = []
+    with redirect_stdout(io.StringIO()):
+        fn()  # warm-up: caches, lazy imports, first-touch of files
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            samples.append((time.perf_counter() - start) / number)
+    return samples
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "median": statistics.median(ordered),
+        "mean": statistics.fmean(ordered),
+        "min": ordered[0],
+        "p95": ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))],
+        "samples": len(ordered),
+    }
+
+
+class Suite:
+    """Collects results for one corpus size."""
+
+    def __init__(self, corpus, repeat):
+        self.corpus = corpus
+        self.repeat = repeat
+        self.results = []
+
+    def record(self, group, name, samples, **params):
+        result = {"group": group, "name": name, "words": self.corpus["words"], "rules": self.corpus["rules"]}
+        result.update(params)
+        result.update(summarize(samples))
+        self.results.append(result)
+        print(f"  {group:<9} {name:<38} median {result['median'] * 1000:10.3f} ms  "
+              f"p95 {result['p95'] * 1000:10.3f} ms")
+
+    def time(self, group, name, fn, repeat=None, number=1, **params):
+        self.record(group, name, measure(fn, repeat or self.repeat, number), **params)
+
+
+def load_corpus_words(words_dir):
+    word_data = []
+    for name in os.listdir(words_dir):
+        if name.startswith('word_') and name.endswith('.json'):
+            with open(os.path.join(words_dir, name), 'r', encoding='utf-8') as f:
+                word_data.append(json.load(f))
+    return word_data
+
+
+def all_rules_of(rules_dir):
+    return [r for _, rules in load_rule_files(rules_dir).values() for r in rules]
+
+
+def sample_expressions(rule_ids):
+    """Query shapes the game and editor use: one rule, a region, a negated region."""
+    c, p, w = rule_ids[0], rule_ids[len(rule_ids) // 2], rule_ids[-1]
+    return {
+        "single": f"{c}",
+        "region": f"{c} AND {p} AND NOT {w}",
+        "none": f"NOT ({c} OR {p} OR {w})",
+    }
+
+
+def bench_server(suite, words_dir, rules_dir, work_dir, concurrency, requests_per_client):
+    """Endpoints under concurrent load through the Flask test client."""
+    cwd = os.getcwd()
+    # server.py resolves its default data paths against the repository root
+    os.chdir(REPO_ROOT)
+    try:
+        sys.path.insert(0, REPO_ROOT)
+        import server
+    finally:
+        os.chdir(cwd)
+
+    original_store = server.store
+    server.store = server.DataStore(words_dir, rules_dir,
+                                    WordIndex(words_dir, os.path.join(work_dir, 'server_index.sqlite3')),
+                                    change_log=ChangeLog(os.path.join(work_dir, 'server_changes.sqlite3')))
+    try:
+        words = server.store.all_words()
+        version = server.store.change_log.version()
+        middle = words[len(words) // 2]
+        rule_ids = sorted(q['ruleId'] for q in middle['questions'])
+        rule_file = sorted(os.listdir(rules_dir))[0]
+        expressions = sample_expressions(rule_ids)
+        body = json.dumps(middle, ensure_ascii=False).encode('utf-8')
+        gets = {
+            "GET /api/words": ("/api/words", {}),
+            "GET /api/words/all": ("/api/words/all", {}),
+            "GET /api/words/all gzip": ("/api/words/all", {"Accept-Encoding": "gzip"}),
+            "GET /api/words/all?ids": ("/api/words/all?ids=1-50", {}),
+            "GET /api/words/lookup": (f"/api/words/lookup?word={middle['word']}", {}),
+            "GET word file": (f"/src/resources/data/words_zh/word_{middle['id']}.json", {}),
+            "GET word file 304": (f"/src/resources/data/words_zh/word_{middle['id']}.json", None),
+            "GET rule file": (f"/src/resources/data/rules_zh/{rule_file}", {}),
+            "GET /api/query count": (f"/api/query?expr={expressions['region']}&count=1", {}),
+            "GET /api/query": (f"/api/query?expr={expressions['region']}", {}),
+            "GET /api/changes": (f"/api/changes?since={version}", {}),
+        }
+
+        def check(response):
+            if response.status_code not in (200, 304):
+                raise RuntimeError(f"HTTP {response.status_code}: {response.get_data(as_text=True)[:200]}")
+            return response
+
+        def run_load(request):
+            def client_loop(_):
+                client = server.app.test_client()
+                latencies = []
+                for _ in range(requests_per_client):
+                    start = time.perf_counter()
+                    check(request(client))
+                    latencies.append(time.perf_counter() - start)
+                return latencies
+
+            request(server.app.test_client())  # warm-up
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                latencies = [t for client_latencies in executor.map(client_loop, range(concurrency))
+                             for t in client_latencies]
+            elapsed = time.perf_counter() - start
+            return latencies, len(latencies) / elapsed
+
+        for name, (path, headers) in gets.items():
+            if headers is None:
+                etag = server.app.test_client().get(path).headers['ETag']
+                headers = {"If-None-Match": etag}
+            request = lambda client, p=path, h=headers: client.get(p, headers=h)
+            if name in BULK_ENDPOINTS:
+                client = server.app.test_client()
+                suite.time('server', name, lambda: check(request(client)), concurrency=1)
+                continue
+            latencies, throughput = run_load(request)
+            suite.record('server', name, latencies, concurrency=concurrency, requests_per_second=throughput)
+
+        # Saves the word unchanged: the server writes the same bytes the generator did
+        latencies, throughput = run_load(lambda client: client.post(
+            f"/api/save-word/{middle['id']}", data=body, content_type='application/json'))
+        suite.record('server', "POST /api/save-word", latencies, concurrency=concurrency,
+                     requests_per_second=throughput)
+
+        # Re-sends one cell's current value, so no version is added and nothing conflicts
+        question = middle['questions'][0]
+        cells = {"baseVersion": version, "cells": [
+            {"wordId": middle['id'], "ruleId": question['ruleId'], "result": question['result']}]}
+        latencies, throughput = run_load(lambda client: client.post("/api/cells", json=cells))
+        suite.record('server', "POST /api/cells", latencies, concurrency=concurrency,
+                     requests_per_second=throughput)
+    finally:
+        server.store = original_store
+
+
+def bench_validator(suite, rules_dir, work_dir, pack_words):
+    """parse_validation_result and save_result on full-size completion texts."""
+    all_rules = all_rules_of(rules_dir)
+    text = synthetic_corpus.synthetic_completion("基准", all_rules)
+    suite.time('validator', "parse_validation_result", lambda: validator.parse_validation_result(text, all_rules),
+               text_bytes=len(text.encode('utf-8')))
+
+    packed_words = [f"基准{i}" for i in range(pack_words)]
+    packed_text = synthetic_corpus.synthetic_completion(None, all_rules, packed_words=packed_words)
+    suite.time('validator', f"parse packed x{pack_words}",
+               lambda: validator.parse_validation_result(packed_text, all_rules, words=packed_words),
+               text_bytes=len(packed_text.encode('utf-8')))
+
+    output_dir = os.path.join(work_dir, 'validator_words')
+    os.makedirs(output_dir, exist_ok=True)
+    suite.time('validator', "save_result", lambda: validator.save_result("基准", text, output_dir, 1, all_rules),
+               number=10)
+
+
+def bench_lookup(suite, words_dir, work_dir, word_data):
+    """find_existing_word_file and id allocation with and without the word index."""
+    index = WordIndex(words_dir, os.path.join(work_dir, 'lookup_index.sqlite3'))
+    target = word_data[len(word_data) // 2]['word']
+    scan_repeat = suite.repeat if len(word_data) <= SCAN_REPEAT_LIMIT else 1
+
+    suite.time('lookup', "find_existing_word_file scan",
+               lambda: validator.find_existing_word_file(target, words_dir), repeat=scan_repeat)
+    suite.time('lookup', "find_existing_word_file index",
+               lambda: validator.find_existing_word_file(target, words_dir, index), number=1000)
+    suite.time('lookup', "find_next_file_number scan",
+               lambda: validator.find_next_file_number(words_dir), repeat=scan_repeat)
+    suite.time('lookup', "find_next_file_number index",
+               lambda: validator.find_next_file_number(words_dir, index, "基准"), number=100)
+    suite.time('lookup', "WordIndex.sync unchanged", index.sync, repeat=scan_repeat)
+    index.close()
+
+
+def bench_matrix(suite, words_dir, rules_dir, word_data, workers):
+    """Truth matrix build and queries, and the puzzle generator's region counts."""
+    suite.time('matrix', "TruthMatrix.from_words", lambda: TruthMatrix.from_words(word_data), repeat=3)
+    matrix = TruthMatrix.from_words(word_data)
+    for shape, expression in sample_expressions(matrix.rule_ids).items():
+        suite.time('matrix', f"evaluate {shape}", lambda e=expression: matrix.evaluate(e), number=100)
+    region = sample_expressions(matrix.rule_ids)['region']
+    suite.time('matrix', "count region", lambda: matrix.count(region), number=100)
+    suite.time('matrix', "query region", lambda: matrix.query(region), number=10)
+
+    rules = load_rule_files(rules_dir)
+    rows = {rule_id: row for row, rule_id in enumerate(matrix.rule_ids)}
+    dense = np.unpackbits(matrix.bits, axis=1, count=len(matrix.words)).astype(np.float32)
+    context, prop, wording = (dense[[rows[r['id']] for r in rules[t][1]]] for t in ('context', 'property', 'wording'))
+    suite.time('matrix', "region_counts", lambda: region_counts(context, prop, wording, workers),
+               repeat=1, workers=workers)
+
+
+def bench_db(suite, words_dir, rules_dir, work_dir):
+    """CorpusDB import and its per-word and per-rule queries."""
+    db_path = os.path.join(work_dir, 'corpus.sqlite3')
+    db = CorpusDB(db_path)
+    suite.time('db', "import_json", lambda: db.import_json(words_dir, rules_dir), repeat=1)
+    word_ids = db.word_ids()
+    middle = word_ids[len(word_ids) // 2]
+    rule_id = db.get_rules()[0]['id']
+    suite.time('db', "get_word", lambda: db.get_word(middle), number=100)
+    suite.time('db', "get_word_id", lambda: db.get_word_id(db.get_word(middle)['word']), number=100)
+    suite.time('db', "words_matching", lambda: db.words_matching(rule_id), number=10)
+    suite.time('db', "all_words", db.all_words, repeat=3)
+    suite.time('db', "set_answer", lambda: db.set_answer(middle, rule_id, True, "基准"), number=100)
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(word_counts, rule_count=150, seed=0, groups=GROUPS, corpus_root=DEFAULT_CORPUS_ROOT, repeat=5,
+        concurrency=8, requests_per_client=25, pack_words=5, workers=1):
+    """Run the selected groups for every corpus size; return the results document."""
+    results = []
+    for word_count in word_counts:
+        corpus_dir = os.path.join(corpus_root, f"w{word_count}_r{rule_count}_s{seed}")
+        print(f"Corpus {word_count} words x {rule_count} rules ({corpus_dir})")
+        start = time.perf_counter()
+        corpus = synthetic_corpus.ensure_corpus(corpus_dir, word_count, rule_count, seed)
+        print(f"  ready in {time.perf_counter() - start:.1f}s")
+        words_dir = os.path.join(corpus_dir, 'words_zh')
+        rules_dir = os.path.join(corpus_dir, 'rules_zh')
+        word_data = load_corpus_words(words_dir)
+        suite = Suite(corpus, repeat)
+        # Indexes, databases and written files go to a scratch directory, not the corpus
+        work_dir = tempfile.mkdtemp(prefix='bench_')
+        try:
+            if 'server' in groups:
+                bench_server(suite, words_dir, rules_dir, work_dir, concurrency, requests_per_client)
+            if 'validator' in groups:
+                bench_validator(suite, rules_dir, work_dir, pack_words)
+            if 'lookup' in groups:
+                bench_lookup(suite, words_dir, work_dir, word_data)
+            if 'matrix' in groups:
+                bench_matrix(suite, words_dir, rules_dir, word_data, workers)
+            if 'db' in groups:
+                bench_db(suite, words_dir, rules_dir, work_dir)
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+        results.extend(suite.results)
+
+    return {
+        "created": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": seed,
+        "results": results,
+    }
+
+
+def result_key(result):
+    return (result["group"], result["name"], result["words"], result["rules"])
+
+
+def compare(baseline, current, threshold):
+    """Print median changes against a baseline; return the cases slower than threshold."""
+    previous = {result_key(r): r for r in baseline["results"]}
+    regressions = []
+    for result in current["results"]:
+        old = previous.get(result_key(result))
+        if old is None or old["median"] <= 0:
+            continue
+        change = result["median"] / old["median"] - 1
+        flag = ''
+        if change > threshold:
+            flag = '  REGRESSION'
+            regressions.append(result)
+        print(f"{result['group']:<9} {result['name']:<38} {result['words']:>7} words  "
+              f"{old['median'] * 1000:10.3f} -> {result['median'] * 1000:10.3f} ms  {change:+7.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the server, validator and query layers on synthetic corpora.')
+    parser.add_argument('--words', type=int, nargs='+', default=[1000], help='Corpus sizes to run (e.g. 1000 10000 100000)')
+    parser.add_argument('--rules', type=int, default=150, help='Rules per corpus')
+    parser.add_argument('--seed', type=int, default=0, help='Corpus random seed')
+    parser.add_argument('--only', help=f"Comma-separated groups to run ({','.join(GROUPS)})")
+    parser.add_argument('--corpus-root', default=DEFAULT_CORPUS_ROOT, help='Where generated corpora are kept between runs')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed rounds per case')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent clients for the server cases')
+    parser.add_argument('--requests', type=int, default=25, help='Requests per client for the server cases')
+    parser.add_argument('--pack-words', type=int, default=5, help='Words in the packed completion text')
+    parser.add_argument('--workers', type=int, default=1, help='Processes for region_counts')
+    parser.add_argument('--output', help='Write the results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2, help='Allowed slowdown of a median before --compare fails (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    groups = GROUPS
+    if args.only:
+        groups = [g.strip() for g in args.only.split(',') if g.strip()]
+        unknown = set(groups) - set(GROUPS)
+        if unknown:
+            parser.error(f"Unknown groups: {', '.join(sorted(unknown))}")
+
+    document = run(args.words, args.rules, args.seed, groups, args.corpus_root, args.repeat,
+                   args.concurrency, args.requests, args.pack_words, args.workers)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(document, f, ensure_ascii=False, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, document, args.threshold)
+        print(f"{len(regressions)} regressions over {args.threshold:.0%}")
+        if regressions:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
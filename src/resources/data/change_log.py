@@ -0,0 +1,309 @@
+"""
+Versioned per-cell change log of the word corpus.
+
+A cell is one (word id, rule id) answer. The log keeps the current value of every
+cell, the corpus version at which it last changed, and a history of changes:
+
+    meta(key, value)                          version, min_version
+    words(word_id, sha, fields)               content hash and non-question fields
+    cells(word_id, rule_id, result, reason, version)
+    changes(seq, version, word_id, rule_id, result, reason, fields)
+
+record_words() diffs word data against the stored cells and appends a change
+row for every cell that differs, all under one new version. It is idempotent,
+so several server processes can feed it the same file change. A change row with
+rule_id NULL is a word-level change (fields NULL: the word was deleted); one with
+result NULL removes the cell.
+
+Only the newest HISTORY_LIMIT change rows are kept. Changes after min_version
+are complete; a client synced to an older version has to reload everything.
+
+Usage:
+    python change_log.py since VERSION [--log PATH]
+    python change_log.py prune [--keep N] [--log PATH]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+from corpus_db import answer_is_true
+
+DEFAULT_WORDS_DIR = os.path.join(os.path.dirname(__file__), 'words_zh')
+HISTORY_LIMIT = 100000
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+INSERT OR IGNORE INTO meta VALUES ('min_version', 0);
+CREATE TABLE IF NOT EXISTS words (
+    word_id INTEGER PRIMARY KEY,
+    sha TEXT NOT NULL,
+    fields TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cells (
+    word_id INTEGER NOT NULL,
+    rule_id INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    reason TEXT,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (word_id, rule_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    version INTEGER NOT NULL,
+    word_id INTEGER NOT NULL,
+    rule_id INTEGER,
+    result INTEGER,
+    reason TEXT,
+    fields TEXT
+);
+CREATE INDEX IF NOT EXISTS changes_version ON changes (version);
+"""
+
+
+def default_log_path(words_dir):
+    """.<dirname>_changes.sqlite3 next to the words directory (or the database file)."""
+    words_dir = os.path.abspath(words_dir)
+    name = os.path.splitext(os.path.basename(words_dir))[0]
+    return os.path.join(os.path.dirname(words_dir), f".{name}_changes.sqlite3")
+
+
+def word_fields(data):
+    """Top-level fields other than the answers, e.g. {"word": ..., "word_en": ...}."""
+    return {k: v for k, v in data.items() if k not in ('id', 'questions')}
+
+
+def word_cells(data):
+    """{rule_id: (result, reason)} for a word dict."""
+    cells = {}
+    for q in data.get('questions', []):
+        if isinstance(q, dict) and isinstance(q.get('ruleId'), int):
+            cells[q['ruleId']] = (1 if answer_is_true(q.get('result')) else 0, q.get('reason'))
+    return cells
+
+
+class ConflictError(Exception):
+    """Cells changed after the version an edit was based on."""
+
+    def __init__(self, conflicts, version):
+        super().__init__(f"{len(conflicts)} cells changed since the base version")
+        self.conflicts = conflicts
+        self.version = version
+
+
+class ChangeLog:
+    """Corpus version, current cells and change history in SQLite; one connection per thread."""
+
+    def __init__(self, path, history_limit=HISTORY_LIMIT):
+        self.path = path
+        self.history_limit = history_limit
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.new_version = None
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction; nested calls join the outer one.
+
+        Everything recorded inside one (outermost) transaction shares a version.
+        BEGIN IMMEDIATE takes SQLite's write lock, which also serialises the
+        check-then-write of conflicting edits across server processes.
+        """
+        conn = self._conn()
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute("BEGIN IMMEDIATE")
+        self._local.new_version = None
+        try:
+            yield conn
+            if self._local.new_version is not None:
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'version'", (self._local.new_version,))
+                self._prune(conn, self.history_limit)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.new_version = None
+
+    def _meta(self, conn, key):
+        return conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()[0]
+
+    def _next_version(self, conn):
+        if self._local.new_version is None:
+            self._local.new_version = self._meta(conn, 'version') + 1
+        return self._local.new_version
+
+    def version(self):
+        """Current corpus version; increases with every recorded change, from any process."""
+        return self._meta(self._conn(), 'version')
+
+    def word_ids(self):
+        return [r[0] for r in self._conn().execute("SELECT word_id FROM words ORDER BY word_id")]
+
+    def record_words(self, words):
+        """Record the current state of some words: [(word_id, raw bytes, data or None if deleted)].
+
+        Returns the number of cells (and word-level rows) that changed.
+        """
+        changed = 0
+        with self.transaction() as conn:
+            # An empty log takes the first state it sees as its baseline, without history
+            baseline = self._meta(conn, 'version') == 0 and conn.execute(
+                "SELECT COUNT(*) FROM words").fetchone()[0] == 0
+            for word_id, raw, data in words:
+                changed += self._record_word(conn, int(word_id), raw, data, baseline)
+            if baseline and changed:
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'min_version'", (self._next_version(conn),))
+        return changed
+
+    def _record_word(self, conn, word_id, raw, data, baseline=False):
+        row = conn.execute("SELECT sha, fields FROM words WHERE word_id = ?", (word_id,)).fetchone()
+        if data is None:
+            if row is None:
+                return 0
+            version = self._next_version(conn)
+            conn.execute("DELETE FROM words WHERE word_id = ?", (word_id,))
+            conn.execute("DELETE FROM cells WHERE word_id = ?", (word_id,))
+            conn.execute("INSERT INTO changes (version, word_id) VALUES (?, ?)", (version, word_id))
+            return 1
+        sha = hashlib.sha256(raw).hexdigest()
+        if row is not None and row[0] == sha:
+            return 0
+
+        fields = json.dumps(word_fields(data), ensure_ascii=False, sort_keys=True)
+        conn.execute("INSERT OR REPLACE INTO words VALUES (?, ?, ?)", (word_id, sha, fields))
+        old = {}
+        if row is not None:
+            old = {r[0]: (r[1], r[2]) for r in conn.execute(
+                "SELECT rule_id, result, reason FROM cells WHERE word_id = ?", (word_id,))}
+        new = word_cells(data)
+        updated = [(rule_id, value) for rule_id, value in new.items() if old.get(rule_id) != value]
+        removed = set(old) - set(new)
+        word_changed = row is None or row[1] != fields
+        # A new hash with identical cells (e.g. reformatting) does not need a new version
+        if not (updated or removed or word_changed):
+            return 0
+
+        version = self._next_version(conn)
+        conn.executemany("INSERT OR REPLACE INTO cells VALUES (?, ?, ?, ?, ?)",
+                         [(word_id, rule_id, *value, version) for rule_id, value in updated])
+        conn.executemany("DELETE FROM cells WHERE word_id = ? AND rule_id = ?",
+                         [(word_id, rule_id) for rule_id in removed])
+        if not baseline:
+            if word_changed:
+                conn.execute("INSERT INTO changes (version, word_id, fields) VALUES (?, ?, ?)",
+                             (version, word_id, fields))
+            conn.executemany("INSERT INTO changes (version, word_id, rule_id, result, reason) VALUES (?, ?, ?, ?, ?)",
+                             [(version, word_id, rule_id, *value) for rule_id, value in updated])
+            conn.executemany("INSERT INTO changes (version, word_id, rule_id) VALUES (?, ?, ?)",
+                             [(version, word_id, rule_id) for rule_id in removed])
+        return len(updated) + len(removed) + word_changed
+
+    def check_cells(self, keys, base_version):
+        """Raise ConflictError if any (word_id, rule_id) changed after base_version.
+
+        Call inside transaction() so nothing can change between the check and the write.
+        """
+        conn = self._conn()
+        if base_version < self._meta(conn, 'min_version'):
+            # History is gone, so whether these cells changed is unknown
+            raise ConflictError([], self._meta(conn, 'version'))
+        conflicts = []
+        for word_id, rule_id in keys:
+            row = conn.execute("SELECT result, reason, version FROM cells WHERE word_id = ? AND rule_id = ?",
+                               (int(word_id), int(rule_id))).fetchone()
+            if row is not None and row[2] > base_version:
+                conflicts.append({"wordId": str(word_id), "ruleId": int(rule_id), "result": bool(row[0]),
+                                  "reason": row[1], "version": row[2]})
+        if conflicts:
+            raise ConflictError(conflicts, self._meta(conn, 'version'))
+
+    def changes_since(self, since):
+        """Latest value of everything that changed after version since.
+
+        {"version", "since", "reset", "words": [...], "cells": [...]}; reset is true
+        when since predates the kept history, and the client must reload instead.
+        """
+        conn = self._conn()
+        # One read transaction, so version and rows are consistent
+        conn.execute("BEGIN")
+        try:
+            version = self._meta(conn, 'version')
+            if since < self._meta(conn, 'min_version') or since > version:
+                return {"version": version, "since": since, "reset": True, "words": [], "cells": []}
+            words = {}
+            cells = {}
+            for row_version, word_id, rule_id, result, reason, fields in conn.execute(
+                    "SELECT version, word_id, rule_id, result, reason, fields FROM changes "
+                    "WHERE version > ? ORDER BY seq", (since,)):
+                if rule_id is None:
+                    words[word_id] = {"wordId": str(word_id), "version": row_version, "deleted": fields is None}
+                    if fields is not None:
+                        words[word_id].update(json.loads(fields))
+                    continue
+                cell = {"wordId": str(word_id), "ruleId": rule_id, "version": row_version}
+                if result is None:
+                    cell["deleted"] = True
+                else:
+                    cell.update(result=bool(result), reason=reason)
+                cells[(word_id, rule_id)] = cell
+        finally:
+            conn.execute("COMMIT")
+        return {"version": version, "since": since, "reset": False,
+                "words": list(words.values()), "cells": list(cells.values())}
+
+    def _prune(self, conn, keep):
+        last = conn.execute("SELECT MAX(seq) FROM changes").fetchone()[0]
+        if last is None or last <= keep:
+            return 0
+        row = conn.execute("SELECT version FROM changes WHERE seq <= ? ORDER BY seq DESC LIMIT 1",
+                           (last - keep,)).fetchone()
+        if row is None:
+            return 0
+        # Whole versions only, so every version after min_version stays complete
+        deleted = conn.execute("DELETE FROM changes WHERE version <= ?", (row[0],)).rowcount
+        conn.execute("UPDATE meta SET value = MAX(value, ?) WHERE key = 'min_version'", (row[0],))
+        return deleted
+
+    def prune(self, keep=HISTORY_LIMIT):
+        """Drop all but the newest keep change rows. Returns the number removed."""
+        with self.transaction() as conn:
+            return self._prune(conn, keep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or prune the corpus change log.')
+    parser.add_argument('command', choices=['since', 'prune'])
+    parser.add_argument('version', type=int, nargs='?', default=0, help='Version to list changes after (since)')
+    parser.add_argument('--log', default=default_log_path(DEFAULT_WORDS_DIR), help='Change log database')
+    parser.add_argument('--keep', type=int, default=HISTORY_LIMIT, help='Change rows to keep (prune)')
+    args = parser.parse_args()
+
+    log = ChangeLog(args.log)
+    if args.command == 'since':
+        print(json.dumps(log.changes_since(args.version), ensure_ascii=False, indent=2))
+    else:
+        print(f"Pruned {log.prune(args.keep)} change rows; version {log.version()}")
+
+
+if __name__ == "__main__":
+    main()
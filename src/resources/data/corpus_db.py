@@ -0,0 +1,338 @@
+"""
+Optional SQLite storage backend for words, rules and answers.
+
+The JSON files stay the source for the webpack build; this database is an
+alternative home for the same data with a normalised schema:
+
+    words(id, word, extra)                  extra = other top-level keys such as word_en
+    rules(id, type, question, difficulty)   type comes from rules_index.json, not id ranges
+    answers(word_id, rule_id, result, reason)
+
+answers is indexed on (rule_id, result) for cross-corpus queries, every write is
+a transaction that bumps meta.version, and the database runs in WAL mode so
+readers never block on a writer.
+
+Usage:
+    python corpus_db.py import [--db corpus.sqlite3]   # JSON files -> database
+    python corpus_db.py export [--db corpus.sqlite3]   # database -> JSON files
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from word_index import WORD_FILE_PATTERN
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'corpus.sqlite3')
+DEFAULT_WORDS_DIR = os.path.join(DATA_DIR, 'words_zh')
+DEFAULT_RULES_DIR = os.path.join(DATA_DIR, 'rules_zh')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO meta VALUES ('version', 0);
+CREATE TABLE IF NOT EXISTS words (
+    id INTEGER PRIMARY KEY,
+    word TEXT NOT NULL,
+    extra TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS words_word ON words (word);
+CREATE TABLE IF NOT EXISTS rules (
+    id INTEGER PRIMARY KEY,
+    type TEXT NOT NULL,
+    question TEXT NOT NULL,
+    difficulty INTEGER
+);
+CREATE INDEX IF NOT EXISTS rules_type ON rules (type);
+CREATE TABLE IF NOT EXISTS answers (
+    word_id INTEGER NOT NULL REFERENCES words (id) ON DELETE CASCADE,
+    rule_id INTEGER NOT NULL,
+    result INTEGER NOT NULL,
+    reason TEXT,
+    PRIMARY KEY (word_id, rule_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_rule_result ON answers (rule_id, result);
+"""
+
+
+def load_rule_files(rules_dir=DEFAULT_RULES_DIR):
+    """{type: (filename, [rule, ...])} for the rule files listed in rules_index.json."""
+    with open(os.path.join(os.path.dirname(rules_dir), 'rules_index.json'), 'r', encoding='utf-8') as f:
+        rule_types = json.load(f)['ruleTypes']
+    files = {}
+    for rule_type, info in rule_types.items():
+        with open(os.path.join(rules_dir, info['file']), 'r', encoding='utf-8') as f:
+            files[rule_type] = (info['file'], json.load(f)['rules'])
+    return files
+
+
+def word_json_bytes(data):
+    """A word file exactly as the JSON corpus stores it."""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+
+
+def word_lines_json_bytes(data):
+    """A word file in the layout validator.py writes: one line per answer."""
+    fields = [f'  "id": {json.dumps(str(data["id"]))}', f'  "word": {json.dumps(data["word"], ensure_ascii=False)}']
+    fields += [f'  {json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}'
+               for k, v in data.items() if k not in ('id', 'word', 'questions')]
+    questions = "".join(f'    {json.dumps(q, ensure_ascii=False)}{"," if i < len(data["questions"]) - 1 else ""}\n'
+                        for i, q in enumerate(data['questions']))
+    fields.append(f'  "questions": [\n{questions}  ]')
+    return ("{\n" + ",\n".join(fields) + "\n}\n").encode('utf-8')
+
+
+def rules_json_bytes(rules):
+    """A rule file in the JSON corpus layout: one rule per line."""
+    lines = ",\n".join(
+        "    { " + ", ".join(f"{json.dumps(k)}: {json.dumps(v, ensure_ascii=False)}" for k, v in r.items()) + " }"
+        for r in rules
+    )
+    return f'{{\n  "rules": [\n{lines}\n  ]\n}}'.encode('utf-8')
+
+
+def answer_is_true(result):
+    """Word files store results as bools, but some older ones use "true"/"false" strings."""
+    if isinstance(result, str):
+        return result.lower() == 'true'
+    return bool(result)
+
+
+def _read_if_exists(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _parses_to(raw, data):
+    try:
+        return json.loads(raw) == data
+    except ValueError:
+        return False
+
+
+def write_if_changed(path, raw):
+    """Atomically replace path with raw; skip the write if the content is identical."""
+    try:
+        with open(path, 'rb') as f:
+            if f.read() == raw:
+                return False
+    except FileNotFoundError:
+        pass
+    fd, tmp_path = tempfile.mkstemp(prefix='.tmp_', dir=os.path.dirname(path) or '.')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(raw)
+    os.replace(tmp_path, path)
+    return True
+
+
+class CorpusDB:
+    """Words, rules and answers in SQLite; one connection per thread."""
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self):
+        """Write transaction that also bumps the corpus version."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'version'")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def version(self):
+        """Monotonic counter bumped by every write, from any process."""
+        return self._conn().execute("SELECT value FROM meta WHERE key = 'version'").fetchone()[0]
+
+    # Rules
+
+    def get_rules(self, rule_type=None):
+        sql = "SELECT id, question, difficulty FROM rules"
+        params = ()
+        if rule_type:
+            sql += " WHERE type = ?"
+            params = (rule_type,)
+        rows = self._conn().execute(sql + " ORDER BY id", params).fetchall()
+        return [{"id": r[0], "question": r[1], "difficulty": r[2]} for r in rows]
+
+    def rule_types(self):
+        return [r[0] for r in self._conn().execute("SELECT DISTINCT type FROM rules ORDER BY type")]
+
+    # Words
+
+    def _word_from_rows(self, word_id, word, extra, answer_rows):
+        data = {"id": str(word_id), "word": word}
+        data.update(json.loads(extra))
+        questions = []
+        for rule_id, result, reason in answer_rows:
+            q = {"ruleId": rule_id, "result": bool(result)}
+            if reason is not None:
+                q["reason"] = reason
+            questions.append(q)
+        data["questions"] = questions
+        return data
+
+    def word_ids(self):
+        return [r[0] for r in self._conn().execute("SELECT id FROM words ORDER BY id")]
+
+    def get_word(self, word_id):
+        conn = self._conn()
+        row = conn.execute("SELECT id, word, extra FROM words WHERE id = ?", (int(word_id),)).fetchone()
+        if row is None:
+            return None
+        answers = conn.execute(
+            "SELECT rule_id, result, reason FROM answers WHERE word_id = ? ORDER BY rule_id", (row[0],)
+        ).fetchall()
+        return self._word_from_rows(*row, answers)
+
+    def get_word_id(self, word):
+        row = self._conn().execute("SELECT MIN(id) FROM words WHERE word = ?", (word,)).fetchone()
+        return row[0] if row else None
+
+    def all_words(self, ids=None):
+        """Every word in the JSON layout, ordered by id; ids (any container of string ids) limits the set."""
+        conn = self._conn()
+        words = {r[0]: r for r in conn.execute("SELECT id, word, extra FROM words ORDER BY id")}
+        if ids is not None:
+            words = {k: v for k, v in words.items() if str(k) in ids}
+        answers = {word_id: [] for word_id in words}
+        for word_id, rule_id, result, reason in conn.execute(
+                "SELECT word_id, rule_id, result, reason FROM answers ORDER BY word_id, rule_id"):
+            if word_id in answers:
+                answers[word_id].append((rule_id, result, reason))
+        return [self._word_from_rows(*words[word_id], answers[word_id]) for word_id in words]
+
+    def _put_word(self, conn, data):
+        word_id = int(data["id"])
+        extra = {k: v for k, v in data.items() if k not in ("id", "word", "questions")}
+        conn.execute("INSERT OR REPLACE INTO words (id, word, extra) VALUES (?, ?, ?)",
+                     (word_id, data["word"], json.dumps(extra, ensure_ascii=False)))
+        conn.execute("DELETE FROM answers WHERE word_id = ?", (word_id,))
+        conn.executemany(
+            "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+            [(word_id, q["ruleId"], 1 if answer_is_true(q.get("result")) else 0, q.get("reason"))
+             for q in data.get("questions", [])]
+        )
+
+    def save_word(self, data):
+        """Replace a word and all its answers in one transaction."""
+        with self.transaction() as conn:
+            self._put_word(conn, data)
+
+    def set_answer(self, word_id, rule_id, result, reason=None):
+        """Update a single cell without touching the rest of the word."""
+        with self.transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?)",
+                         (int(word_id), int(rule_id), 1 if result else 0, reason))
+
+    def allocate_id(self, word):
+        """Insert an empty word row with the next free id and return the id."""
+        with self.transaction() as conn:
+            word_id = (conn.execute("SELECT MAX(id) FROM words").fetchone()[0] or 0) + 1
+            conn.execute("INSERT INTO words (id, word) VALUES (?, ?)", (word_id, word))
+        return word_id
+
+    def words_matching(self, rule_id, result=True):
+        """Ids of words whose answer to a rule is result (uses the (rule_id, result) index)."""
+        return [r[0] for r in self._conn().execute(
+            "SELECT word_id FROM answers WHERE rule_id = ? AND result = ? ORDER BY word_id",
+            (int(rule_id), 1 if result else 0))]
+
+    # JSON import / export
+
+    def import_json(self, words_dir=DEFAULT_WORDS_DIR, rules_dir=DEFAULT_RULES_DIR):
+        """Replace the database contents with the JSON corpus. Returns (words, rules)."""
+        rule_files = load_rule_files(rules_dir)
+        word_data = []
+        for name in os.listdir(words_dir):
+            if WORD_FILE_PATTERN.match(name):
+                with open(os.path.join(words_dir, name), 'r', encoding='utf-8') as f:
+                    word_data.append(json.load(f))
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM answers")
+            conn.execute("DELETE FROM words")
+            conn.execute("DELETE FROM rules")
+            rule_count = 0
+            for rule_type, (_, rules) in rule_files.items():
+                conn.executemany("INSERT INTO rules VALUES (?, ?, ?, ?)",
+                                 [(r['id'], rule_type, r['question'], r.get('difficulty')) for r in rules])
+                rule_count += len(rules)
+            for data in word_data:
+                self._put_word(conn, data)
+        return len(word_data), rule_count
+
+    def export_json(self, words_dir=DEFAULT_WORDS_DIR, rules_dir=DEFAULT_RULES_DIR):
+        """Write the database back out in the JSON corpus layout. Returns the number of files changed.
+
+        Files whose content is unchanged are left alone, changed word files keep their
+        layout (indented or one line per answer), and word files for words no longer
+        in the database are removed.
+        """
+        os.makedirs(words_dir, exist_ok=True)
+        changed = 0
+        exported = set()
+        for data in self.all_words():
+            name = f"word_{data['id']}.json"
+            exported.add(name)
+            existing = _read_if_exists(os.path.join(words_dir, name))
+            if existing is not None and _parses_to(existing, data):
+                continue
+            one_per_line = existing is not None and b'\n    {"ruleId"' in existing
+            raw = word_lines_json_bytes(data) if one_per_line else word_json_bytes(data)
+            changed += write_if_changed(os.path.join(words_dir, name), raw)
+        for name in os.listdir(words_dir):
+            if WORD_FILE_PATTERN.match(name) and name not in exported:
+                os.remove(os.path.join(words_dir, name))
+                changed += 1
+        for rule_type, (filename, rules) in load_rule_files(rules_dir).items():
+            current = self.get_rules(rule_type)
+            if rules != current:
+                changed += write_if_changed(os.path.join(rules_dir, filename), rules_json_bytes(current))
+        return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import or export the SQLite corpus database.')
+    parser.add_argument('command', choices=['import', 'export'])
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help='Database file')
+    parser.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+    parser.add_argument('--rules-dir', default=DEFAULT_RULES_DIR, help='Directory holding the rule files')
+    args = parser.parse_args()
+
+    db = CorpusDB(args.db)
+    if args.command == 'import':
+        words, rules = db.import_json(args.words_dir, args.rules_dir)
+        print(f"Imported {words} words and {rules} rules into {args.db}")
+    else:
+        changed = db.export_json(args.words_dir, args.rules_dir)
+        print(f"Exported {args.db}: {changed} files changed")
+
+
+if __name__ == "__main__":
+    main()
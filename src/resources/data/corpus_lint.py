@@ -0,0 +1,373 @@
+"""
+Lint the word corpus against the rule catalog.
+
+Per-file checks (results cached by content hash, so reruns only re-check files
+that changed):
+
+    invalid-json, invalid-structure   file cannot be used at all
+    id-mismatch                       "id" differs from the number in the filename
+    empty-word                        no word text
+    missing-rule, duplicate-rule      catalog rules with no answer / answered twice
+    invalid-result                    result is neither a bool nor "true"/"false"
+    unknown-rule                      answers for rule ids not in the catalog (warning)
+    string-result                     result stored as "true"/"false" (warning)
+    placeholder-reason, empty-reason  unanswered or unexplained rules (warning)
+
+Corpus-wide checks: duplicate-word (same word in several files) and, for the
+catalog itself, duplicate-rule-id and rule-out-of-range.
+
+Changed files are checked across a process pool when there are enough of them.
+
+Usage:
+    python corpus_lint.py [--report lint_report.json] [--workers 4] [--no-cache]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from corpus_db import load_rule_files
+from word_index import WORD_FILE_PATTERN
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORDS_DIR = os.path.join(DATA_DIR, 'words_zh')
+DEFAULT_RULES_DIR = os.path.join(DATA_DIR, 'rules_zh')
+# Same text as validator.missing_reason()
+PLACEHOLDER_REASON_PATTERN = re.compile(r'^未获得对规则\s*\d+\s*的回答$')
+# Bump when checks change so cached results are recomputed
+LINT_VERSION = 1
+# Below this many changed files a process pool costs more than it saves
+POOL_THRESHOLD = 200
+SEVERITIES = {
+    'invalid-json': 'error',
+    'invalid-structure': 'error',
+    'id-mismatch': 'error',
+    'empty-word': 'error',
+    'missing-rule': 'error',
+    'duplicate-rule': 'error',
+    'invalid-result': 'error',
+    'duplicate-word': 'error',
+    'duplicate-rule-id': 'error',
+    'unknown-rule': 'warning',
+    'string-result': 'warning',
+    'placeholder-reason': 'warning',
+    'empty-reason': 'warning',
+    'rule-out-of-range': 'warning',
+}
+
+
+def default_cache_path(words_dir):
+    """.<dirname>_lint.sqlite3 next to the words directory."""
+    words_dir = os.path.abspath(words_dir)
+    return os.path.join(os.path.dirname(words_dir), f".{os.path.basename(words_dir)}_lint.sqlite3")
+
+
+def issue(code, file=None, message='', **details):
+    entry = {"code": code, "severity": SEVERITIES[code], "message": message}
+    if file is not None:
+        entry["file"] = file
+    entry.update(details)
+    return entry
+
+
+def _id_list(ids):
+    return ', '.join(str(i) for i in ids[:10]) + (f" (+{len(ids) - 10} more)" if len(ids) > 10 else '')
+
+
+def check_word_file(filename, raw, rule_ids):
+    """Lint one word file's bytes. Returns (word or None, [issue, ...])."""
+    try:
+        data = json.loads(raw)
+    except ValueError as e:
+        return None, [issue('invalid-json', filename, f"Not valid JSON: {str(e)}")]
+    if not isinstance(data, dict) or not isinstance(data.get('questions'), list):
+        return None, [issue('invalid-structure', filename, 'Expected an object with a "questions" list')]
+
+    issues = []
+    match = WORD_FILE_PATTERN.match(filename)
+    if match and str(data.get('id')) != match.group(1):
+        issues.append(issue('id-mismatch', filename, f"id is {data.get('id')!r}, filename says {match.group(1)}"))
+    word = data.get('word')
+    if not isinstance(word, str) or not word.strip():
+        issues.append(issue('empty-word', filename, 'No word text'))
+        word = None
+
+    seen, duplicates, unknown, invalid, strings, placeholders, empty_reasons = set(), [], [], [], [], [], []
+    for q in data['questions']:
+        rule_id = q.get('ruleId') if isinstance(q, dict) else None
+        if not isinstance(rule_id, int) or isinstance(rule_id, bool):
+            invalid.append(rule_id)
+            continue
+        if rule_id in seen:
+            duplicates.append(rule_id)
+        seen.add(rule_id)
+        if rule_id not in rule_ids:
+            unknown.append(rule_id)
+        result = q.get('result')
+        if isinstance(result, str):
+            if result.lower() in ('true', 'false'):
+                strings.append(rule_id)
+            else:
+                invalid.append(rule_id)
+        elif not isinstance(result, bool):
+            invalid.append(rule_id)
+        reason = q.get('reason')
+        if not isinstance(reason, str) or not reason.strip():
+            empty_reasons.append(rule_id)
+        elif PLACEHOLDER_REASON_PATTERN.match(reason.strip()):
+            placeholders.append(rule_id)
+
+    missing = sorted(rule_ids - seen)
+    if missing:
+        issues.append(issue('missing-rule', filename, f"No answer for rules {_id_list(missing)}", ruleIds=missing))
+    if duplicates:
+        issues.append(issue('duplicate-rule', filename, f"Rules answered twice: {_id_list(duplicates)}",
+                            ruleIds=duplicates))
+    if invalid:
+        issues.append(issue('invalid-result', filename, f"Bad ruleId or result for rules {_id_list(invalid)}",
+                            ruleIds=invalid))
+    if unknown:
+        issues.append(issue('unknown-rule', filename, f"Answers for rules not in the catalog: {_id_list(unknown)}",
+                            ruleIds=unknown))
+    if strings:
+        issues.append(issue('string-result', filename, f"String results for rules {_id_list(strings)}",
+                            ruleIds=strings))
+    if placeholders:
+        issues.append(issue('placeholder-reason', filename, f"Unanswered rules {_id_list(placeholders)}",
+                            ruleIds=placeholders))
+    if empty_reasons:
+        issues.append(issue('empty-reason', filename, f"No reason for rules {_id_list(empty_reasons)}",
+                            ruleIds=empty_reasons))
+    return word, issues
+
+
+def _check_chunk(words_dir, filenames, rule_ids):
+    """Worker: read and lint a list of files. Returns [(filename, sig, hash, word, issues)]."""
+    results = []
+    for filename in filenames:
+        path = os.path.join(words_dir, filename)
+        try:
+            stat = os.stat(path)
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            continue
+        word, issues = check_word_file(filename, raw, rule_ids)
+        results.append((filename, (stat.st_mtime_ns, stat.st_size), hashlib.sha256(raw).hexdigest(), word, issues))
+    return results
+
+
+def check_catalog(rule_files, rules_dir):
+    """Issues in the rule files themselves, including ids outside their type's idRange."""
+    with open(os.path.join(os.path.dirname(rules_dir), 'rules_index.json'), 'r', encoding='utf-8') as f:
+        rule_types = json.load(f)['ruleTypes']
+    issues = []
+    seen = {}
+    for rule_type, (filename, rules) in rule_files.items():
+        low, high = rule_types[rule_type].get('idRange', (None, None))
+        for rule in rules:
+            rule_id = rule.get('id')
+            if low is not None and not low <= rule_id <= high:
+                issues.append(issue('rule-out-of-range', filename,
+                                    f"Rule {rule_id} is outside the {rule_type} range {low}-{high}",
+                                    ruleIds=[rule_id]))
+            if rule_id in seen:
+                issues.append(issue('duplicate-rule-id', filename,
+                                    f"Rule {rule_id} is also defined in {seen[rule_id]}", ruleIds=[rule_id]))
+            seen[rule_id] = filename
+    return issues
+
+
+class CorpusLinter:
+    """Lints a words directory, caching per-file results keyed by content hash.
+
+    The cache is safe to share between threads; unchanged files (same mtime and
+    size, or same content hash) are never re-parsed.
+    """
+
+    def __init__(self, words_dir=DEFAULT_WORDS_DIR, rules_dir=DEFAULT_RULES_DIR, cache_path=None, workers=None):
+        self.words_dir = words_dir
+        self.rules_dir = rules_dir
+        self.workers = workers or os.cpu_count() or 1
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(cache_path or ':memory:', timeout=30, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS files (
+                filename TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                size INTEGER,
+                content_hash TEXT,
+                catalog_hash TEXT,
+                word TEXT,
+                issues TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS files_word ON files (word)")
+        self._conn.commit()
+
+    def _catalog(self):
+        rule_files = load_rule_files(self.rules_dir)
+        rule_ids = frozenset(r['id'] for _, rules in rule_files.values() for r in rules)
+        catalog_hash = hashlib.sha256(json.dumps([LINT_VERSION, sorted(rule_ids)]).encode('utf-8')).hexdigest()
+        return rule_files, rule_ids, catalog_hash
+
+    def _disk_files(self):
+        return [name for name in os.listdir(self.words_dir) if WORD_FILE_PATTERN.match(name)]
+
+    def _check(self, filenames, rule_ids):
+        if len(filenames) < POOL_THRESHOLD or self.workers <= 1:
+            return _check_chunk(self.words_dir, filenames, rule_ids)
+        size = -(-len(filenames) // (self.workers * 4))
+        chunks = [filenames[i:i + size] for i in range(0, len(filenames), size)]
+        results = []
+        with ProcessPoolExecutor(max_workers=self.workers) as executor:
+            for chunk_results in executor.map(_check_chunk, [self.words_dir] * len(chunks), chunks,
+                                              [rule_ids] * len(chunks)):
+                results.extend(chunk_results)
+        return results
+
+    def lint(self, filenames=None):
+        """Lint every word file (or only filenames) and return the report dict.
+
+        With filenames, duplicate-word still compares against every file: ones
+        never linted before are checked once, the rest use their cached words.
+        """
+        start = time.perf_counter()
+        rule_files, rule_ids, catalog_hash = self._catalog()
+        disk = set(self._disk_files())
+        targets = disk if filenames is None else {f for f in filenames if f in disk}
+
+        with self._lock:
+            cached = {row[0]: row[1:] for row in self._conn.execute(
+                "SELECT filename, mtime_ns, size, content_hash, catalog_hash FROM files")}
+        stale, rehash = [], []
+        for filename in targets | (disk - set(cached)):
+            entry = cached.get(filename)
+            if entry is None or entry[3] != catalog_hash:
+                stale.append(filename)
+                continue
+            stat = os.stat(os.path.join(self.words_dir, filename))
+            if (entry[0], entry[1]) != (stat.st_mtime_ns, stat.st_size):
+                rehash.append(filename)
+
+        # A touched but unchanged file only needs its hash compared, not a re-lint
+        for filename in rehash:
+            path = os.path.join(self.words_dir, filename)
+            stat = os.stat(path)
+            with open(path, 'rb') as f:
+                content_hash = hashlib.sha256(f.read()).hexdigest()
+            if content_hash == cached[filename][2]:
+                with self._lock:
+                    self._conn.execute("UPDATE files SET mtime_ns = ?, size = ? WHERE filename = ?",
+                                       (stat.st_mtime_ns, stat.st_size, filename))
+            else:
+                stale.append(filename)
+
+        results = self._check(sorted(stale), rule_ids)
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(filename, sig[0], sig[1], content_hash, catalog_hash, word, json.dumps(issues, ensure_ascii=False))
+                 for filename, sig, content_hash, word, issues in results]
+            )
+            if filenames is None:
+                gone = set(cached) - disk
+                self._conn.executemany("DELETE FROM files WHERE filename = ?", [(f,) for f in gone])
+            self._conn.commit()
+            rows = self._conn.execute("SELECT filename, word, issues FROM files").fetchall()
+
+        issues = check_catalog(rule_files, self.rules_dir) if filenames is None else []
+        files_by_word = {}
+        for filename, word, file_issues in rows:
+            if filename not in disk:
+                continue
+            if filename in targets:
+                issues.extend(json.loads(file_issues))
+            if word is not None:
+                files_by_word.setdefault(word, []).append(filename)
+        for word, files in sorted(files_by_word.items()):
+            if len(files) > 1 and targets.intersection(files):
+                files = sorted(files, key=lambda f: int(WORD_FILE_PATTERN.match(f).group(1)))
+                issues.append(issue('duplicate-word', files[0], f"'{word}' is also in {', '.join(files[1:])}",
+                                    word=word, files=files))
+
+        issues.sort(key=lambda i: (i['severity'] != 'error', _file_order(i.get('file')), i['code']))
+        checked = sum(1 for result in results if result[0] in targets)
+        return {
+            "version": LINT_VERSION,
+            "created": time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            "files": len(targets),
+            "checked": checked,
+            "cached": len(targets) - checked,
+            "errors": sum(1 for i in issues if i['severity'] == 'error'),
+            "warnings": sum(1 for i in issues if i['severity'] == 'warning'),
+            "seconds": round(time.perf_counter() - start, 4),
+            "issues": issues,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _file_order(filename):
+    match = WORD_FILE_PATTERN.match(filename or '')
+    return (0, int(match.group(1)), '') if match else (1, 0, filename or '')
+
+
+def summary(report):
+    counts = {}
+    for i in report['issues']:
+        counts[i['code']] = counts.get(i['code'], 0) + 1
+    detail = ', '.join(f"{code} x{count}" for code, count in sorted(counts.items()))
+    return (f"{report['files']} files ({report['checked']} checked, {report['cached']} cached): "
+            f"{report['errors']} errors, {report['warnings']} warnings" + (f" [{detail}]" if detail else ''))
+
+
+def write_report(report, path):
+    """Write the report atomically so readers never see a partial file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the word corpus against the rule catalog.')
+    parser.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+    parser.add_argument('--rules-dir', default=DEFAULT_RULES_DIR, help='Directory holding the rule files')
+    parser.add_argument('--cache', help='Result cache (default: .<words dir>_lint.sqlite3 next to it)')
+    parser.add_argument('--no-cache', action='store_true', help='Re-check every file')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes for checking changed files')
+    parser.add_argument('--report', help='Write the full report as JSON to this file')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON instead of text')
+    parser.add_argument('--errors-only', action='store_true', help='Leave warnings out of the text output')
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else (args.cache or default_cache_path(args.words_dir))
+    linter = CorpusLinter(args.words_dir, args.rules_dir, cache_path, args.workers)
+    report = linter.lint()
+    linter.close()
+
+    if args.report:
+        write_report(report, args.report)
+    if args.json:
+        print(json.dumps(report, ensure_ascii=False, indent=2))
+    else:
+        for i in report['issues']:
+            if args.errors_only and i['severity'] != 'error':
+                continue
+            print(f"{i['severity']:<7} {i.get('file', '-'):<22} {i['code']:<18} {i['message']}")
+        print(summary(report) + f" in {report['seconds']:.2f}s")
+    if report['errors']:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Compile the word corpus into the compact artifacts the game loads.
+
+The game only needs each word's true/false answers to play; reason text is shown
+when a mistake is explained. The corpus is therefore split in two:
+
+    game/answers.json                 ids, word text and one answer bitset per word
+    public/reasons/reasons_N.HASH.json  reason text for a range of word ids
+
+answers.json lists ruleIds once; a word's bitset is base64 of its answers in
+that order, most significant bit first (the np.packbits order truth_matrix.py
+uses). Rules a word has no answer for are listed after the bitset. Reason shards
+hold SHARD_SIZE consecutive word ids each, as {wordId: [reason per ruleId]}, and
+are named by a hash of their content so they can be cached forever.
+
+Builds are incremental: a manifest records each word file's content hash, only
+changed files are parsed, and only the shards containing them are rewritten.
+
+Usage:
+    python game_bundle.py [--words-dir DIR] [--shard-size 8] [--force]
+"""
+
+import argparse
+import base64
+import hashlib
+import json
+import os
+import re
+import time
+
+from corpus_db import answer_is_true, write_if_changed
+from word_index import WORD_FILE_PATTERN
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.abspath(os.path.join(DATA_DIR, '..', '..', '..'))
+DEFAULT_WORDS_DIR = os.path.join(DATA_DIR, 'words_zh')
+DEFAULT_RULES_INDEX = os.path.join(DATA_DIR, 'rules_index.json')
+DEFAULT_ANSWERS_PATH = os.path.join(DATA_DIR, 'game', 'answers.json')
+DEFAULT_REASONS_DIR = os.path.join(REPO_ROOT, 'public', 'reasons')
+MANIFEST_NAME = '.game_bundle_manifest.json'
+BUNDLE_VERSION = 1
+SHARD_SIZE = 8
+SHARD_FILE_PATTERN = re.compile(r'^reasons_(\d+)\.[0-9a-f]+\.json$')
+
+
+def rule_ids_from_index(rules_index_path=DEFAULT_RULES_INDEX):
+    """Every rule id covered by the idRanges in rules_index.json, in order."""
+    with open(rules_index_path, 'r', encoding='utf-8') as f:
+        rule_types = json.load(f)['ruleTypes']
+    ids = set()
+    for info in rule_types.values():
+        first, last = info['idRange']
+        ids.update(range(first, last + 1))
+    return sorted(ids)
+
+
+def pack_answers(answers, rule_ids):
+    """Base64 bitset of answers ({ruleId: bool}) in rule_ids order."""
+    packed = bytearray((len(rule_ids) + 7) // 8)
+    for i, rule_id in enumerate(rule_ids):
+        if answers.get(rule_id):
+            packed[i >> 3] |= 0x80 >> (i & 7)
+    return base64.b64encode(bytes(packed)).decode('ascii')
+
+
+def unpack_answers(bits, rule_ids):
+    """Inverse of pack_answers: {ruleId: bool} for every rule in rule_ids."""
+    packed = base64.b64decode(bits)
+    return {rule_id: bool(packed[i >> 3] & (0x80 >> (i & 7))) for i, rule_id in enumerate(rule_ids)}
+
+
+def compile_word(data, rule_ids):
+    """(answers row, reasons list) for one parsed word file."""
+    answers = {}
+    reasons = {}
+    for q in data.get('questions', []):
+        rule_id = q.get('ruleId')
+        answers[rule_id] = answer_is_true(q.get('result'))
+        if q.get('reason'):
+            reasons[rule_id] = q['reason']
+    row = [str(data['id']), data.get('word', ''), data.get('word_en', ''), pack_answers(answers, rule_ids)]
+    missing = [rule_id for rule_id in rule_ids if rule_id not in answers]
+    if missing:
+        row.append(missing)
+    return row, [reasons.get(rule_id) for rule_id in rule_ids]
+
+
+def shard_of(word_id, shard_size):
+    return (int(word_id) - 1) // shard_size
+
+
+def answers_json_bytes(rule_ids, shard_size, shards, rows):
+    """answers.json with one word per line, so a rebuild diffs line by line."""
+    header = json.dumps({
+        "version": BUNDLE_VERSION,
+        "ruleIds": rule_ids,
+        "shardSize": shard_size,
+        "reasonShards": {str(k): shards[k] for k in sorted(shards)},
+    }, separators=(',', ':'))
+    lines = ",\n".join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) for row in rows)
+    return f'{header[:-1]},"words":[\n{lines}\n]}}\n'.encode('utf-8')
+
+
+def _read_manifest(path):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build(words_dir=DEFAULT_WORDS_DIR, answers_path=DEFAULT_ANSWERS_PATH, reasons_dir=DEFAULT_REASONS_DIR,
+          rule_ids=None, shard_size=SHARD_SIZE, force=False):
+    """Bring answers.json and the reason shards up to date with words_dir. Returns build stats."""
+    start = time.time()
+    if rule_ids is None:
+        rule_ids = rule_ids_from_index()
+    os.makedirs(os.path.dirname(answers_path), exist_ok=True)
+    os.makedirs(reasons_dir, exist_ok=True)
+    manifest_path = os.path.join(os.path.dirname(answers_path), MANIFEST_NAME)
+
+    settings = {"version": BUNDLE_VERSION, "ruleIds": rule_ids, "shardSize": shard_size}
+    manifest = _read_manifest(manifest_path)
+    if force or manifest is None or manifest.get('settings') != settings:
+        manifest = {"settings": settings, "words": {}, "shards": {}}
+    old_words = manifest['words']
+    shards = {int(k): v for k, v in manifest['shards'].items()}
+
+    files = {}
+    for name in os.listdir(words_dir):
+        match = WORD_FILE_PATTERN.match(name)
+        if match:
+            files[int(match.group(1))] = os.path.join(words_dir, name)
+
+    words = {}
+    reasons = {}
+    dirty = set()
+    changed = 0
+    for word_id, path in files.items():
+        st = os.stat(path)
+        entry = old_words.get(str(word_id))
+        if entry and entry['size'] == st.st_size and entry['mtime_ns'] == st.st_mtime_ns:
+            words[word_id] = entry
+            continue
+        with open(path, 'rb') as f:
+            raw = f.read()
+        sha = hashlib.sha1(raw).hexdigest()
+        if entry and entry['sha'] == sha:
+            words[word_id] = dict(entry, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            continue
+        row, reasons[word_id] = compile_word(json.loads(raw), rule_ids)
+        changed += 1
+        words[word_id] = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "sha": sha, "row": row}
+        dirty.add(shard_of(word_id, shard_size))
+
+    dirty.update(shard_of(word_id, shard_size) for word_id in map(int, old_words) if word_id not in files)
+    # A shard deleted or never written since the manifest was saved
+    dirty.update(k for k, name in shards.items() if not os.path.exists(os.path.join(reasons_dir, name)))
+
+    shard_members = {}
+    for word_id in sorted(words):
+        shard_members.setdefault(shard_of(word_id, shard_size), []).append(word_id)
+    reasons_written = 0
+    for shard in sorted(dirty):
+        members = shard_members.get(shard)
+        if not members:
+            shards.pop(shard, None)
+            continue
+        content = {}
+        for word_id in members:
+            if word_id not in reasons:
+                with open(files[word_id], 'r', encoding='utf-8') as f:
+                    _, reasons[word_id] = compile_word(json.load(f), rule_ids)
+            content[str(word_id)] = reasons[word_id]
+        raw = json.dumps(content, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+        name = f"reasons_{shard}.{hashlib.sha1(raw).hexdigest()[:10]}.json"
+        if write_if_changed(os.path.join(reasons_dir, name), raw):
+            reasons_written += 1
+        shards[shard] = name
+
+    # Shards replaced by a new hash, or left from a build without a manifest
+    live = set(shards.values())
+    for name in os.listdir(reasons_dir):
+        if SHARD_FILE_PATTERN.match(name) and name not in live:
+            os.remove(os.path.join(reasons_dir, name))
+
+    rows = [words[word_id]['row'] for word_id in sorted(words)]
+    answers_raw = answers_json_bytes(rule_ids, shard_size, shards, rows)
+    answers_written = write_if_changed(answers_path, answers_raw)
+
+    manifest = {"settings": settings, "words": {str(k): v for k, v in words.items()},
+                "shards": {str(k): v for k, v in shards.items()}}
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, separators=(',', ':'))
+
+    return {
+        "words": len(words),
+        "changed": changed,
+        "shards": len(shards),
+        "shards_written": reasons_written,
+        "answers_written": answers_written,
+        "answers_bytes": len(answers_raw),
+        "reasons_bytes": sum(os.path.getsize(os.path.join(reasons_dir, name)) for name in live),
+        "seconds": time.time() - start,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the compact answers artifact and reason shards for the game.')
+    parser.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+    parser.add_argument('--rules-index', default=DEFAULT_RULES_INDEX, help='rules_index.json listing the rule id ranges')
+    parser.add_argument('--answers', default=DEFAULT_ANSWERS_PATH, help='Answers artifact to write')
+    parser.add_argument('--reasons-dir', default=DEFAULT_REASONS_DIR, help='Directory for the reason shards')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Word ids per reason shard')
+    parser.add_argument('--force', action='store_true', help='Ignore the manifest and rebuild everything')
+    args = parser.parse_args()
+
+    stats = build(args.words_dir, args.answers, args.reasons_dir, rule_ids_from_index(args.rules_index),
+                  args.shard_size, args.force)
+    print(f"{stats['words']} words: {stats['changed']} changed, wrote {stats['shards_written']}/{stats['shards']} "
+          f"reason shards, answers {'updated' if stats['answers_written'] else 'unchanged'} "
+          f"in {stats['seconds']:.2f}s")
+    print(f"answers.json {stats['answers_bytes'] / 1024:.1f} KB, reasons {stats['reasons_bytes'] / 1024:.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
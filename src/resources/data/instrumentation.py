@@ -0,0 +1,169 @@
+"""
+Metrics and profiling helpers shared by the server and the validator.
+
+Metrics is a minimal thread-safe registry of counters and histograms rendered in
+the Prometheus text format, so /metrics needs no client library. Two opt-in
+profilers are provided: start_cprofile() profiles the current thread (one
+server request), and StackSampler samples the stacks of every thread, which is what a
+bulk validation run with worker threads needs.
+"""
+
+import cProfile
+import sys
+import threading
+from collections import Counter
+
+# Seconds; spans cached file reads up to whole-corpus responses
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Bytes; a word file is ~10 KB, the whole corpus several MB
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    parts = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metrics:
+    """Counters and histograms keyed by name and label set."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta = {}        # name -> (type, help, buckets)
+        self._counters = {}    # name -> {labels: value}
+        self._histograms = {}  # name -> {labels: [bucket counts..., sum, count]}
+
+    def counter(self, name, help_text):
+        self._meta[name] = ('counter', help_text, None)
+        self._counters.setdefault(name, {})
+
+    def gauge(self, name, help_text):
+        self._meta[name] = ('gauge', help_text, None)
+        self._counters.setdefault(name, {})
+
+    def histogram(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self._meta[name] = ('histogram', help_text, tuple(buckets))
+        self._histograms.setdefault(name, {})
+
+    def inc(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._counters[name]
+            values[key] = values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._counters[name][key] = value
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        buckets = self._meta[name][2]
+        with self._lock:
+            series = self._histograms[name].get(key)
+            if series is None:
+                series = self._histograms[name][key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        lines = []
+        with self._lock:
+            for name, (kind, help_text, buckets) in self._meta.items():
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+                if kind != 'histogram':
+                    for labels, value in sorted(self._counters[name].items()):
+                        lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+                    continue
+                for labels, series in sorted(self._histograms[name].items()):
+                    for bound, count in zip(buckets + (float('inf'),), series[:-2] + [series[-1]]):
+                        le = labels + (('le', _format_value(bound)),)
+                        lines.append(f"{name}_bucket{_format_labels(le)} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series[-2])}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {series[-1]}")
+        return "\n".join(lines) + "\n"
+
+
+def start_cprofile():
+    """A running cProfile.Profile for the current thread, or None if one is already active.
+
+    Stop it with disable() and save it with dump_stats(path).
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Newer Pythons allow only one active cProfile per process
+        return None
+    return profiler
+
+
+class StackSampler:
+    """Wall-clock sampling profiler over all threads.
+
+    Every interval the stack of each thread is recorded, so time spent waiting on
+    the API or the rate limiter shows up as well as CPU time. write() saves the
+    samples in the collapsed-stack format flamegraph tools read.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def write(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+    def top(self, limit=15):
+        """[(frame, share of samples)] for the innermost frames seen most often."""
+        total = sum(self.samples.values())
+        leaves = Counter()
+        for stack, count in self.samples.items():
+            leaves[stack.rsplit(';', 1)[-1]] += count
+        return [(frame, count / total) for frame, count in leaves.most_common(limit)] if total else []
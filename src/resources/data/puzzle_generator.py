@@ -0,0 +1,149 @@
+"""
+Offline puzzle generator.
+
+Scores every context x property x wording rule triple against the corpus and
+writes a compact index of the playable ones for the game to sample from. For each
+triple the eight region sizes (context, property, wording, the three pairs, all
+and none) are derived by inclusion-exclusion from per-rule, pairwise and
+three-way overlap counts. The three-way counts are matrix products over the word
+axis, spread across a process pool one slice of context rules at a time.
+
+Usage:
+    python puzzle_generator.py [--output puzzles_zh.json] [--workers 4] [--min-per-region 1]
+"""
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from corpus_db import load_rule_files
+from truth_matrix import TruthMatrix
+
+DATA_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_WORDS_DIR = os.path.join(DATA_DIR, 'words_zh')
+DEFAULT_RULES_DIR = os.path.join(DATA_DIR, 'rules_zh')
+DEFAULT_OUTPUT = os.path.join(DATA_DIR, 'puzzles_zh.json')
+RULE_TYPES = ['context', 'property', 'wording']
+# Same names and order as findCorrectArea in src/utils/rules.ts
+REGIONS = ['context', 'property', 'wording', 'context+property', 'context+wording',
+           'property+wording', 'all', 'none']
+
+# Per-process operands, set once by _init_worker instead of pickled per task
+_operands = {}
+
+
+def _init_worker(context, prop, wording):
+    _operands['context'] = context
+    _operands['property'] = prop
+    _operands['wording'] = wording
+
+
+def _three_way_counts(rows):
+    """|C_i & P_j & W_k| for the given context rows, shape (len(rows), P, W)."""
+    context, prop, wording = _operands['context'], _operands['property'], _operands['wording']
+    out = np.empty((len(rows), prop.shape[0], wording.shape[0]), dtype=np.int64)
+    for n, i in enumerate(rows):
+        # float32 products are exact for counts below 2**24 words
+        out[n] = np.rint((prop * context[i]) @ wording.T)
+    return out
+
+
+def region_counts(context, prop, wording, workers=1):
+    """Region sizes for every triple, shape (C, P, W, 8) in REGIONS order.
+
+    context/prop/wording are float32 0/1 matrices of shape (rules, words).
+    """
+    total = context.shape[1]
+    a = context.sum(axis=1).astype(np.int64)[:, None, None]
+    b = prop.sum(axis=1).astype(np.int64)[None, :, None]
+    w = wording.sum(axis=1).astype(np.int64)[None, None, :]
+    ab = np.rint(context @ prop.T).astype(np.int64)[:, :, None]
+    aw = np.rint(context @ wording.T).astype(np.int64)[:, None, :]
+    bw = np.rint(prop @ wording.T).astype(np.int64)[None, :, :]
+
+    chunks = [list(r) for r in np.array_split(np.arange(context.shape[0]), max(1, workers * 4)) if len(r)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(context, prop, wording)) as executor:
+            abw = np.concatenate(list(executor.map(_three_way_counts, chunks)))
+    else:
+        _init_worker(context, prop, wording)
+        abw = np.concatenate([_three_way_counts(rows) for rows in chunks])
+
+    return np.stack(np.broadcast_arrays(
+        a - ab - aw + abw,                       # context only
+        b - ab - bw + abw,                       # property only
+        w - aw - bw + abw,                       # wording only
+        ab - abw,                                # context+property
+        aw - abw,                                # context+wording
+        bw - abw,                                # property+wording
+        abw,                                     # all
+        total - a - b - w + ab + aw + bw - abw,  # none
+    ), axis=-1)
+
+
+def balance_scores(counts):
+    """Normalised entropy of the region sizes: 1.0 when all eight are equal."""
+    total = counts.sum(axis=-1, keepdims=True)
+    p = counts / np.maximum(total, 1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        entropy = -np.where(p > 0, p * np.log(p), 0.0).sum(axis=-1)
+    return entropy / np.log(len(REGIONS))
+
+
+def generate(words_dir=DEFAULT_WORDS_DIR, rules_dir=DEFAULT_RULES_DIR, workers=1, min_per_region=1):
+    """Score all triples and return the puzzle index as a dict ready for JSON."""
+    rules = {rule_type: type_rules for rule_type, (_, type_rules) in load_rule_files(rules_dir).items()}
+    rule_ids = [r['id'] for rule_type in RULE_TYPES for r in rules[rule_type]]
+    matrix = TruthMatrix.from_directory(words_dir, rule_ids)
+    dense = np.unpackbits(matrix.bits, axis=1, count=len(matrix.words)).astype(np.float32)
+    offsets = np.cumsum([0] + [len(rules[t]) for t in RULE_TYPES])
+    context, prop, wording = (dense[offsets[i]:offsets[i + 1]] for i in range(3))
+
+    counts = region_counts(context, prop, wording, workers)
+    balance = balance_scores(counts)
+    smallest = counts.min(axis=-1)
+    difficulty = (np.array([r.get('difficulty', 1) for r in rules['context']])[:, None, None] +
+                  np.array([r.get('difficulty', 1) for r in rules['property']])[None, :, None] +
+                  np.array([r.get('difficulty', 1) for r in rules['wording']])[None, None, :])
+
+    playable = np.argwhere(smallest >= min_per_region)
+    order = np.argsort(-balance[tuple(playable.T)], kind='stable')
+    puzzles = []
+    for i, j, k in playable[order]:
+        puzzles.append([
+            rules['context'][i]['id'], rules['property'][j]['id'], rules['wording'][k]['id'],
+            int(difficulty[i, j, k]), round(float(balance[i, j, k]), 3), int(smallest[i, j, k])
+        ])
+
+    return {
+        "wordCount": len(matrix.words),
+        "tripleCount": int(counts.shape[0] * counts.shape[1] * counts.shape[2]),
+        "minPerRegion": min_per_region,
+        "regions": REGIONS,
+        "fields": ["context", "property", "wording", "difficulty", "balance", "minRegion"],
+        "puzzles": puzzles
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute playable context x property x wording rule triples.')
+    parser.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+    parser.add_argument('--rules-dir', default=DEFAULT_RULES_DIR, help='Directory holding the rule files')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Where to write the puzzle index')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes for the three-way counts')
+    parser.add_argument('--min-per-region', type=int, default=1, help='Minimum words in every region for a playable triple')
+    args = parser.parse_args()
+
+    index = generate(args.words_dir, args.rules_dir, args.workers, args.min_per_region)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(index, f, ensure_ascii=False, separators=(',', ':'))
+    print(f"{len(index['puzzles'])}/{index['tripleCount']} triples playable over {index['wordCount']} words; "
+          f"saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
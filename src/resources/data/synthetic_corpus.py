@@ -0,0 +1,157 @@
+"""
+Synthetic corpus generator for benchmarks.
+
+Writes a corpus in the same layout as the real one, so every tool can be pointed
+at it unchanged:
+
+    <output>/words_zh/word_N.json     {id, word, word_en, questions}
+    <output>/rules_zh/*_rules.json    one rule per line
+    <output>/rules_index.json         rule type -> file
+
+Rules are split into context, property and wording thirds. Each rule gets its own
+probability of answering true, so queries and puzzle regions have realistic,
+uneven selectivity. The same seed always produces the same corpus.
+
+Usage:
+    python synthetic_corpus.py OUTPUT_DIR [--words 10000] [--rules 150] [--seed 0]
+"""
+
+import argparse
+import json
+import os
+import random
+
+from corpus_db import rules_json_bytes, word_json_bytes
+from word_index import WORD_FILE_PATTERN
+
+RULE_TYPES = ['context', 'property', 'wording']
+MANIFEST_NAME = 'synthetic_corpus.json'
+# CJK Unified Ideographs, the block the real words and reasons are written in
+CJK_START, CJK_END = 0x4E00, 0x9FA5
+REASON_POOL_SIZE = 2000
+
+
+def _cjk_text(rng, length):
+    return ''.join(chr(rng.randint(CJK_START, CJK_END)) for _ in range(length))
+
+
+def synthetic_rules(rule_count, seed=0):
+    """{type: [rule, ...]} with ids 1..rule_count split into three contiguous ranges."""
+    rng = random.Random(f"rules:{seed}")
+    per_type = rule_count // len(RULE_TYPES)
+    rules = {}
+    next_id = 1
+    for n, rule_type in enumerate(RULE_TYPES):
+        count = per_type if n < len(RULE_TYPES) - 1 else rule_count - per_type * n
+        rules[rule_type] = [
+            {"id": rule_id, "question": f"{_cjk_text(rng, rng.randint(6, 14))}？", "difficulty": rng.randint(1, 3)}
+            for rule_id in range(next_id, next_id + count)
+        ]
+        next_id += count
+    return rules
+
+
+def synthetic_words(word_count, rules, seed=0):
+    """Yield word dicts with an answer for every rule, in id order."""
+    rng = random.Random(f"words:{seed}")
+    all_rules = [r for rule_type in RULE_TYPES for r in rules[rule_type]]
+    truth_rate = {r['id']: rng.uniform(0.05, 0.95) for r in all_rules}
+    reasons = [_cjk_text(rng, rng.randint(8, 30)) for _ in range(REASON_POOL_SIZE)]
+    seen = set()
+    for word_id in range(1, word_count + 1):
+        word = _cjk_text(rng, rng.randint(2, 4))
+        while word in seen:
+            word = _cjk_text(rng, rng.randint(2, 5))
+        seen.add(word)
+        yield {
+            "id": str(word_id),
+            "word": word,
+            "word_en": f"synthetic-{word_id}",
+            "questions": [
+                {"ruleId": r['id'], "result": rng.random() < truth_rate[r['id']], "reason": rng.choice(reasons)}
+                for r in all_rules
+            ]
+        }
+
+
+def synthetic_completion(word, all_rules, seed=0, packed_words=None):
+    """Completion text as the model returns it for word (or, packed, for several words)."""
+    rng = random.Random(f"completion:{seed}:{word}")
+    lines = ["以下是验证结果：", ""]
+    for w in packed_words or [word]:
+        for r in all_rules:
+            result = 'true' if rng.random() < 0.5 else 'false'
+            reason = _cjk_text(rng, rng.randint(8, 30))
+            prefix = f"word: {w}, " if packed_words else ""
+            lines.append(f"{prefix}ruleId: {r['id']}, result: {result}, reason: {reason}")
+    return "\n".join(lines)
+
+
+def read_manifest(output_dir):
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def generate(output_dir, word_count, rule_count=150, seed=0):
+    """Write a synthetic corpus to output_dir. Returns its manifest."""
+    words_dir = os.path.join(output_dir, 'words_zh')
+    rules_dir = os.path.join(output_dir, 'rules_zh')
+    os.makedirs(words_dir, exist_ok=True)
+    os.makedirs(rules_dir, exist_ok=True)
+
+    # Drop the manifest first so an interrupted run is regenerated, and any words
+    # left over from a larger corpus
+    if os.path.exists(os.path.join(output_dir, MANIFEST_NAME)):
+        os.remove(os.path.join(output_dir, MANIFEST_NAME))
+    for name in os.listdir(words_dir):
+        match = WORD_FILE_PATTERN.match(name)
+        if match and int(match.group(1)) > word_count:
+            os.remove(os.path.join(words_dir, name))
+
+    rules = synthetic_rules(rule_count, seed)
+    rule_index = {"ruleTypes": {}}
+    for rule_type in RULE_TYPES:
+        filename = f"{rule_type}_rules.json"
+        with open(os.path.join(rules_dir, filename), 'wb') as f:
+            f.write(rules_json_bytes(rules[rule_type]))
+        ids = [r['id'] for r in rules[rule_type]]
+        rule_index["ruleTypes"][rule_type] = {"file": filename, "idRange": [ids[0], ids[-1]]}
+    with open(os.path.join(output_dir, 'rules_index.json'), 'w', encoding='utf-8') as f:
+        json.dump(rule_index, f, ensure_ascii=False, indent=2)
+
+    for data in synthetic_words(word_count, rules, seed):
+        with open(os.path.join(words_dir, f"word_{data['id']}.json"), 'wb') as f:
+            f.write(word_json_bytes(data))
+
+    manifest = {"words": word_count, "rules": rule_count, "seed": seed}
+    # Written last: a corpus without a manifest is treated as incomplete
+    with open(os.path.join(output_dir, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def ensure_corpus(output_dir, word_count, rule_count=150, seed=0):
+    """Reuse the corpus in output_dir if it was generated with the same parameters."""
+    manifest = {"words": word_count, "rules": rule_count, "seed": seed}
+    if read_manifest(output_dir) == manifest:
+        return manifest
+    return generate(output_dir, word_count, rule_count, seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic word corpus in the word_N.json layout.')
+    parser.add_argument('output_dir', help='Directory to create words_zh/, rules_zh/ and rules_index.json in')
+    parser.add_argument('--words', type=int, default=10000, help='Number of words')
+    parser.add_argument('--rules', type=int, default=150, help='Number of rules, split evenly over the three types')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed')
+    args = parser.parse_args()
+
+    generate(args.output_dir, args.words, args.rules, args.seed)
+    print(f"Generated {args.words} words x {args.rules} rules in {args.output_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+"""
+Bit-packed word x rule truth matrix with a boolean query engine.
+
+Each rule keeps a packed bitset over all words (an inverted index: bit i is set
+when word i answers true). Queries such as "12 AND NOT 77 AND 130" are evaluated
+as whole-array bitwise operations, so a region lookup stays in the sub-millisecond
+range even for 100k words.
+
+Usage:
+    python truth_matrix.py query "12 AND NOT (77 OR 130)" [--count]
+    python truth_matrix.py build --output matrix.npz
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+
+import numpy as np
+
+from corpus_db import answer_is_true
+
+DEFAULT_WORDS_DIR = os.path.join(os.path.dirname(__file__), 'words_zh')
+# Keywords must stand alone: "andnot" or "ORrule" is not read as two operators
+TOKEN_PATTERN = re.compile(r'\s*(?:(\d+)|(\()|(\))|(\band(?![a-z])|&&?)|(\bor(?![a-z])|\|\|?)|'
+                           r'(\bnot(?![a-z])|!|~)|(\brule(?![a-z])))', re.IGNORECASE)
+# Deepest parenthesis nesting accepted; the parser recurses once per level
+MAX_NESTING = 100
+
+
+class TruthMatrix:
+    """Packed rule -> word bitsets for a fixed list of words."""
+
+    def __init__(self, word_ids, words, rule_ids, bits):
+        self.word_ids = list(word_ids)
+        self.words = list(words)
+        self.rule_ids = list(rule_ids)
+        self.bits = bits  # uint8, shape (len(rule_ids), ceil(len(words) / 8))
+        self._rule_rows = {rule_id: row for row, rule_id in enumerate(self.rule_ids)}
+        # Every real word set; NOT must not switch on the padding bits of the last byte
+        self.all_words = np.packbits(np.ones(len(self.words), dtype=bool))
+
+    @classmethod
+    def from_words(cls, word_data, rule_ids=None):
+        """Build from parsed word JSON dicts ({id, word, questions})."""
+        word_data = sorted(word_data, key=lambda d: int(d['id']))
+        if rule_ids is None:
+            rule_ids = sorted({q['ruleId'] for d in word_data for q in d.get('questions', [])})
+        rows = {rule_id: row for row, rule_id in enumerate(rule_ids)}
+        dense = np.zeros((len(rule_ids), len(word_data)), dtype=bool)
+        for col, data in enumerate(word_data):
+            for q in data.get('questions', []):
+                row = rows.get(q.get('ruleId'))
+                if row is not None and answer_is_true(q.get('result')):
+                    dense[row, col] = True
+        bits = np.packbits(dense, axis=1)
+        return cls([str(d['id']) for d in word_data], [d.get('word') for d in word_data], rule_ids, bits)
+
+    @classmethod
+    def from_directory(cls, words_dir=DEFAULT_WORDS_DIR, rule_ids=None):
+        word_data = []
+        for file_path in glob.glob(os.path.join(words_dir, 'word_*.json')):
+            with open(file_path, 'r', encoding='utf-8') as f:
+                word_data.append(json.load(f))
+        return cls.from_words(word_data, rule_ids)
+
+    def save(self, path):
+        np.savez_compressed(path, bits=self.bits, rule_ids=np.array(self.rule_ids, dtype=np.int32),
+                            word_ids=np.array(self.word_ids), words=np.array(self.words))
+
+    @classmethod
+    def load(cls, path):
+        data = np.load(path)
+        return cls(data['word_ids'].tolist(), data['words'].tolist(), data['rule_ids'].tolist(), data['bits'])
+
+    def rule_bits(self, rule_id):
+        """Packed bitset of the words answering true for a rule."""
+        row = self._rule_rows.get(int(rule_id))
+        if row is None:
+            raise ValueError(f"Unknown rule {rule_id}")
+        return self.bits[row]
+
+    def evaluate(self, expression):
+        """Evaluate a boolean rule expression to a packed word bitset.
+
+        Grammar: OR binds loosest, then AND, then NOT; parentheses group. Rules are
+        written as numbers, optionally prefixed by "rule". &/|/! work as AND/OR/NOT.
+        Raises ValueError for malformed input or more than MAX_NESTING nested parentheses.
+        """
+        return _ExpressionParser(self, expression).parse()
+
+    def indices(self, bits):
+        """Column positions of the words set in a packed bitset."""
+        return np.flatnonzero(np.unpackbits(bits, count=len(self.words)))
+
+    def count(self, expression):
+        return int(np.unpackbits(self.evaluate(expression), count=len(self.words)).sum())
+
+    def query(self, expression):
+        """Words matching an expression, as [{'id', 'word'}] in id order."""
+        return [{'id': self.word_ids[i], 'word': self.words[i]} for i in self.indices(self.evaluate(expression))]
+
+
+class _ExpressionParser:
+    """Recursive-descent parser that evaluates directly on packed bitsets."""
+
+    def __init__(self, matrix, expression):
+        self.matrix = matrix
+        self.tokens = self._tokenize(expression)
+        self.pos = 0
+        self.depth = 0
+
+    @staticmethod
+    def _tokenize(expression):
+        tokens = []
+        pos = 0
+        expression = expression.strip()
+        while pos < len(expression):
+            match = TOKEN_PATTERN.match(expression, pos)
+            if not match:
+                raise ValueError(f"Unexpected input at position {pos}: {expression[pos:pos + 10]!r}")
+            number, lparen, rparen, and_, or_, not_, _rule = match.groups()
+            if number:
+                tokens.append(('RULE', int(number)))
+            elif lparen:
+                tokens.append(('(', None))
+            elif rparen:
+                tokens.append((')', None))
+            elif and_:
+                tokens.append(('AND', None))
+            elif or_:
+                tokens.append(('OR', None))
+            elif not_:
+                tokens.append(('NOT', None))
+            # "rule" is a filler word in front of a number
+            pos = match.end()
+        return tokens
+
+    def _peek(self):
+        return self.tokens[self.pos][0] if self.pos < len(self.tokens) else None
+
+    def _take(self, kind):
+        if self._peek() != kind:
+            found = self._peek() or 'end of expression'
+            raise ValueError(f"Expected {kind}, found {found}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError("Empty expression")
+        result = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self._peek()} after complete expression")
+        return result
+
+    def _or(self):
+        result = self._and()
+        while self._peek() == 'OR':
+            self.pos += 1
+            result = np.bitwise_or(result, self._and())
+        return result
+
+    def _and(self):
+        result = self._not()
+        while self._peek() == 'AND':
+            self.pos += 1
+            result = np.bitwise_and(result, self._not())
+        return result
+
+    def _not(self):
+        negations = 0
+        while self._peek() == 'NOT':
+            self.pos += 1
+            negations += 1
+        if self._peek() == '(':
+            self.pos += 1
+            self.depth += 1
+            if self.depth > MAX_NESTING:
+                raise ValueError(f"Expression nested deeper than {MAX_NESTING} parentheses")
+            result = self._or()
+            self._take(')')
+            self.depth -= 1
+        else:
+            _, rule_id = self._take('RULE')
+            result = self.matrix.rule_bits(rule_id)
+        if negations % 2:
+            result = np.bitwise_and(np.invert(result), self.matrix.all_words)
+        return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the word x rule truth matrix.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    query_parser = subparsers.add_parser('query', help='List the words matching a rule expression')
+    query_parser.add_argument('expression', help='e.g. "12 AND NOT 77 AND 130"')
+    query_parser.add_argument('--count', action='store_true', help='Only print the number of matches')
+    build_parser = subparsers.add_parser('build', help='Compile the corpus to a compressed .npz matrix')
+    build_parser.add_argument('--output', required=True, help='Output .npz path')
+    for sub in (query_parser, build_parser):
+        sub.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+        sub.add_argument('--matrix', help='Load a prebuilt .npz instead of reading the word files')
+    args = parser.parse_args()
+
+    if args.matrix:
+        matrix = TruthMatrix.load(args.matrix)
+    else:
+        matrix = TruthMatrix.from_directory(args.words_dir)
+
+    if args.command == 'build':
+        matrix.save(args.output)
+        print(f"Saved {len(matrix.words)} words x {len(matrix.rule_ids)} rules to {args.output}")
+        return
+
+    try:
+        if args.count:
+            print(matrix.count(args.expression))
+        else:
+            for match in matrix.query(args.expression):
+                print(f"{match['id']}\t{match['word']}")
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Persistent cache of LLM rule answers.
+
+Each answer is stored under a content address built from the word, the rule id,
+a hash of the rule text and the model name, so rewording a rule or switching
+model invalidates exactly the affected entries.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def rule_hash(rule):
+    """Hash of the rule text; difficulty and other metadata do not affect answers."""
+    return hashlib.sha256(rule.get('question', '').encode('utf-8')).hexdigest()[:16]
+
+
+def cache_key(word, rule_id, rule_text_hash, model):
+    payload = json.dumps([word, int(rule_id), rule_text_hash, model], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ValidationCache:
+    """SQLite-backed answer cache, safe to share between worker threads."""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS answers (
+                key TEXT PRIMARY KEY,
+                word TEXT NOT NULL,
+                rule_id INTEGER NOT NULL,
+                rule_hash TEXT NOT NULL,
+                model TEXT NOT NULL,
+                result INTEGER NOT NULL,
+                reason TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        self._conn.commit()
+
+    def get_many(self, word, rules, model):
+        """Return {rule_id: question} for every rule that has a cached answer."""
+        keys = {cache_key(word, r['id'], rule_hash(r), model): r['id'] for r in rules}
+        found = {}
+        with self._lock:
+            key_list = list(keys)
+            # Stay well under SQLite's bound-parameter limit
+            for start in range(0, len(key_list), 500):
+                chunk = key_list[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, result, reason FROM answers WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, result, reason in rows:
+                    rule_id = keys[key]
+                    found[rule_id] = {"ruleId": rule_id, "result": bool(result), "reason": reason}
+        return found
+
+    def stale_rules(self, word, rules, model):
+        """Rules whose answer for this word is not cached under the current text and model."""
+        cached = self.get_many(word, rules, model)
+        return [r for r in rules if r['id'] not in cached]
+
+    def put_many(self, word, questions, rules, model):
+        """Store answered questions; rules maps each ruleId to the rule it was asked against."""
+        rules_by_id = {r['id']: r for r in rules}
+        now = time.time()
+        rows = []
+        for q in questions:
+            rule = rules_by_id.get(q['ruleId'])
+            if rule is None:
+                continue
+            h = rule_hash(rule)
+            rows.append((cache_key(word, q['ruleId'], h, model), word, q['ruleId'], h, model,
+                         1 if q['result'] else 0, q['reason'], now))
+        if not rows:
+            return 0
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+            )
+            self._conn.commit()
+        return len(rows)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -4,17 +4,43 @@ import requests
 import argparse
 import re
 import glob
+import hashlib
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from requests.adapters import HTTPAdapter
+from validation_cache import ValidationCache, rule_hash
+from word_index import WordIndex
+from corpus_db import CorpusDB, word_lines_json_bytes
+from instrumentation import StackSampler
+from corpus_lint import CorpusLinter, DEFAULT_RULES_DIR, default_cache_path as default_lint_cache_path, summary as lint_summary
 
 # Set the API key as environment variable
 
+# Completions endpoint; override OPENAI_API_URL to point at a local stub server
+API_URL = os.environ.get('OPENAI_API_URL', "https://api.openai.com/v1/chat/completions")
+MODEL = "gpt-4.1"
+# Status codes worth retrying with backoff
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+# Persistent answer cache used by --incremental
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(__file__), '.validation_cache.sqlite3')
+# One answer line: "ruleId: N, result: true/false, reason: ..."
+RULE_LINE_PATTERN = r'ruleId:\s*(\d+),\s*result:\s*(true|false),\s*reason:\s*(.+)'
+# Serialises appends to stream progress files from parallel shards
+_progress_lock = threading.Lock()
+
 def load_rules_from_file(file_path):
     """Load rules from a JSON file."""
     with open(file_path, 'r', encoding='utf-8') as f:
         data = json.load(f)
         return data.get('rules', [])
 
-def get_all_rules():
-    """Get all rules from the rules_zh directory."""
+def get_all_rules(db=None):
+    """Get all rules from the rules_zh directory (or from a CorpusDB)."""
+    if db is not None:
+        return db.get_rules()
     rules_dir = os.path.join(os.path.dirname(__file__), 'rules_zh')
     
     all_rules = []
@@ -30,18 +56,11 @@ def get_all_rules():
     
     return all_rules
 
-def validate_word(word, api_key=None):
-    """Validate a word against all rules using OpenAI API."""
-    if not api_key:
-        api_key = os.environ.get('OPENAI_API_KEY')
-        if not api_key:
-            raise ValueError("OpenAI API key not provided")
-    
-    all_rules = get_all_rules()
-    
-    system_prompt = f"""
+def build_system_prompt(all_rules):
+    """Build the system prompt that embeds the rule list."""
+    return f"""
 下面是一组要验证的规则列表（JSON 数组），
-当我给定一个"词语"时，请拆解它的笔画，部首和声调，请你针对共150条规则输出 true/false 并给出简要理由：
+当我给定一个"词语"时，请拆解它的笔画，部首和声调，请你针对共{len(all_rules)}条规则输出 true/false 并给出简要理由：
 {json.dumps(all_rules, ensure_ascii=False, indent=None)}
 
 请使用以下格式回答，确保每条规则的ruleId, result 和 reason都在同一行：
@@ -52,28 +71,421 @@ ruleId: 2, result: true/false, reason: 简短理由
 请确保对所有规则都给出回答，不要遗漏任何规则。
 请确保reason字段不包含换行符，所有内容都在一行内完成。
     """
-    
-    url = "https://api.openai.com/v1/chat/completions"
+
+def build_packed_system_prompt(all_rules):
+    """System prompt for several words in one request; every answer line names its word."""
+    return f"""
+下面是一组要验证的规则列表（JSON 数组），
+我会给出若干个"词语"（每行一个），请逐个拆解它们的笔画，部首和声调，请你针对每个词语的共{len(all_rules)}条规则输出 true/false 并给出简要理由：
+{json.dumps(all_rules, ensure_ascii=False, indent=None)}
+
+请使用以下格式回答，确保每个词语的每条规则的word, ruleId, result 和 reason都在同一行：
+word: 词语, ruleId: 1, result: true/false, reason: 简短理由
+word: 词语, ruleId: 2, result: true/false, reason: 简短理由
+...
+
+请确保对每个词语的所有规则都给出回答，不要遗漏任何词语或规则。
+请确保reason字段不包含换行符，所有内容都在一行内完成。
+    """
+
+def estimate_tokens(text):
+    """Rough token estimate used for rate limiting before the real usage is known."""
+    # Chinese text is roughly one token per character, JSON/ASCII closer to four characters
+    return len(text) // 2 + 1
+
+def create_session(pool_size=10):
+    """Create a requests session that reuses connections across calls."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+class RateLimiter:
+    """Sliding one-minute window limiting requests and tokens per minute.
+
+    A limit of None disables that dimension. acquire() blocks until the call fits
+    and returns a handle that can be passed to adjust() once real usage is known.
+    """
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, window=60.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.window = window
+        self._lock = threading.Lock()
+        self._entries = []  # [timestamp, tokens]
+
+    def _fits(self, tokens):
+        if self.requests_per_minute is not None and len(self._entries) >= self.requests_per_minute:
+            return False
+        if self.tokens_per_minute is not None and self._entries:
+            used = sum(entry[1] for entry in self._entries)
+            if used + tokens > self.tokens_per_minute:
+                return False
+        return True
+
+    def acquire(self, tokens=0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._entries = [e for e in self._entries if now - e[0] < self.window]
+                if self._fits(tokens):
+                    entry = [now, tokens]
+                    self._entries.append(entry)
+                    return entry
+                wait = self._entries[0][0] + self.window - now
+            time.sleep(max(wait, 0.01))
+
+    def adjust(self, entry, actual_tokens):
+        """Replace the estimated token count of an acquired call with the real one."""
+        with self._lock:
+            entry[1] = actual_tokens
+
+def backoff_delay(attempt, response=None, base_delay=1.0, max_delay=60.0):
+    """Exponential backoff with jitter, honouring Retry-After when the server sends it."""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), max_delay)
+            except ValueError:
+                pass
+    delay = min(base_delay * (2 ** attempt), max_delay)
+    return delay * (0.5 + random.random() / 2)
+
+def post_with_retries(session, url, headers, data, timeout, rate_limiter, estimated, timing, max_retries,
+                      stream=False):
+    """POST data, retrying 429/5xx and connection errors with backoff.
+
+    Returns (response, rate limiter entry) for the first successful response, whose
+    body the caller reads; raises once max_retries is used up.
+    """
+    for attempt in range(max_retries + 1):
+        timing.attempts = attempt + 1
+        with timing.measure('queue_wait'):
+            entry = rate_limiter.acquire(estimated) if rate_limiter else None
+        try:
+            with timing.measure('http_latency'):
+                response = session.post(url, headers=headers, json=data, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt == max_retries:
+                timing.record(error=str(e))
+                raise
+            delay = backoff_delay(attempt)
+            print(f"Request failed ({str(e)}), retrying in {delay:.1f}s")
+            timing.backoff(delay)
+            continue
+
+        if response.status_code in RETRY_STATUS_CODES and attempt < max_retries:
+            response.close()
+            delay = backoff_delay(attempt, response)
+            print(f"API returned {response.status_code}, retrying in {delay:.1f}s")
+            timing.backoff(delay)
+            continue
+
+        if response.status_code >= 400:
+            timing.record(status=response.status_code, error=response.reason)
+        response.raise_for_status()
+        return response, entry
+
+def request_completion(messages, api_key, session=None, rate_limiter=None, max_retries=5,
+                       api_url=None, model=MODEL, timeout=300, timing_log=None, label=None):
+    """POST a chat completion, retrying 429/5xx and connection errors with backoff.
+
+    Returns the parsed JSON response. With a TimingLog, one "request" entry is written
+    per call (label names the word or words asked about).
+    """
+    session = session or requests
+    url = api_url or API_URL
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+    data = {
+        "model": model,
+        "messages": messages
+    }
+    estimated = estimate_tokens("".join(m["content"] for m in messages))
+    timing = CallTiming(timing_log, label, 'completion', estimated)
+    response, entry = post_with_retries(session, url, headers, data, timeout, rate_limiter, estimated,
+                                        timing, max_retries)
+    result = response.json()
+    usage = result.get('usage') or {}
+    if entry is not None and usage.get('total_tokens'):
+        rate_limiter.adjust(entry, usage['total_tokens'])
+    timing.record(status=response.status_code, usage=usage)
+    return result
+
+def stream_completion(messages, api_key, session=None, rate_limiter=None, max_retries=5,
+                      api_url=None, model=MODEL, timeout=300, timing_log=None, label=None):
+    """POST a streaming chat completion and yield content deltas as they arrive.
+
+    Failures before the stream starts are retried like request_completion; a connection
+    dropped mid-stream raises to the caller, which already has the earlier deltas.
+    """
+    session = session or requests
+    url = api_url or API_URL
     headers = {
         "Content-Type": "application/json",
         "Authorization": f"Bearer {api_key}"
     }
     data = {
-        "model": "gpt-4.1",  # Updated to use gpt-4.1
-        "messages": [
-            {"role": "system", "content": system_prompt},
+        "model": model,
+        "messages": messages,
+        "stream": True,
+        "stream_options": {"include_usage": True}
+    }
+    estimated = estimate_tokens("".join(m["content"] for m in messages))
+    timing = CallTiming(timing_log, label, 'stream', estimated)
+    response, entry = post_with_retries(session, url, headers, data, timeout, rate_limiter, estimated,
+                                        timing, max_retries, stream=True)
+
+    # http_latency so far is time to the response headers; the body is timed separately
+    usage = {}
+    finished = False
+    stream_start = time.perf_counter()
+    first_token = None
+    try:
+        for raw_line in response.iter_lines():
+            # Decode ourselves: event streams often arrive without a charset
+            line = raw_line.decode('utf-8')
+            if not line.startswith('data:'):
+                continue
+            payload = line[len('data:'):].strip()
+            if payload == '[DONE]':
+                finished = True
+                break
+            chunk = json.loads(payload)
+            usage = chunk.get('usage') or usage
+            if entry is not None and usage and usage.get('total_tokens'):
+                rate_limiter.adjust(entry, usage['total_tokens'])
+            for choice in chunk.get('choices') or []:
+                content = (choice.get('delta') or {}).get('content')
+                if content:
+                    if first_token is None:
+                        first_token = time.perf_counter() - stream_start
+                    yield content
+    finally:
+        response.close()
+        # Not finished: the caller stopped reading early or the connection dropped
+        timing.record(status=response.status_code, usage=usage, finished=finished,
+                      first_token=first_token, stream_time=time.perf_counter() - stream_start)
+
+def split_rules(all_rules, shards):
+    """Split the rule list into at most `shards` contiguous, evenly sized chunks."""
+    shards = max(1, min(shards, len(all_rules)))
+    size, extra = divmod(len(all_rules), shards)
+    chunks = []
+    start = 0
+    for i in range(shards):
+        end = start + size + (1 if i < extra else 0)
+        chunks.append(all_rules[start:end])
+        start = end
+    return chunks
+
+def validate_word(word, api_key=None, all_rules=None, session=None, rate_limiter=None, api_url=None,
+                  shards=1, stream=False, progress_path=None, timing_log=None):
+    """Validate a word against all rules using OpenAI API.
+
+    With shards > 1 the rules are split into that many requests that run in parallel;
+    the answers are concatenated so parse_validation_result handles them unchanged.
+    With stream=True the answer is consumed incrementally (see validate_word_streaming).
+    """
+    if not api_key:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not provided")
+    
+    if all_rules is None:
+        all_rules = get_all_rules()
+    
+    if shards > 1 and len(all_rules) > 1:
+        chunks = split_rules(all_rules, shards)
+        with ThreadPoolExecutor(max_workers=len(chunks)) as executor:
+            texts = list(executor.map(
+                lambda chunk: validate_word(word, api_key, chunk, session, rate_limiter, api_url,
+                                            stream=stream, progress_path=progress_path, timing_log=timing_log),
+                chunks
+            ))
+        return "\n".join(texts)
+    
+    if stream:
+        return validate_word_streaming(word, api_key, all_rules, session, rate_limiter, api_url,
+                                       progress_path=progress_path, timing_log=timing_log)
+    
+    messages = [
+        {"role": "system", "content": build_system_prompt(all_rules)},
+        {"role": "user", "content": word}
+    ]
+    result = request_completion(messages, api_key, session=session, rate_limiter=rate_limiter,
+                                api_url=api_url, timing_log=timing_log, label=word)
+    
+    return result['choices'][0]['message']['content']
+
+def parse_rule_line(line):
+    """Parse one answer line into a question dict, or None if it is not an answer."""
+    match = re.search(RULE_LINE_PATTERN, line, re.IGNORECASE)
+    if not match:
+        return None
+    rule_id, result, reason = match.groups()
+    return {
+        "ruleId": int(rule_id),
+        "result": result.lower() == "true",
+        # Clean reason text to ensure it's on a single line
+        "reason": clean_reason_text(reason)
+    }
+
+class StreamingRuleParser:
+    """Turn streamed text deltas into answers, one per completed line."""
+
+    def __init__(self):
+        self._buffer = ''
+
+    def feed(self, text):
+        """Add a delta; return answers for every line it completed."""
+        self._buffer += text
+        *lines, self._buffer = self._buffer.split('\n')
+        return [q for q in map(parse_rule_line, lines) if q]
+
+    def close(self):
+        """Parse the trailing line once the stream has finished normally."""
+        line, self._buffer = self._buffer, ''
+        q = parse_rule_line(line)
+        return [q] if q else []
+
+def stream_progress_path(output_dir, word):
+    """Progress file for a streamed validation of word (not picked up as a word file)."""
+    digest = hashlib.sha1(word.encode('utf-8')).hexdigest()[:12]
+    return os.path.join(output_dir, f".stream_{digest}.jsonl")
+
+def load_stream_progress(progress_path, word, all_rules):
+    """Answers already streamed for word, ignoring rules whose text changed since."""
+    answers = {}
+    if not progress_path or not os.path.exists(progress_path):
+        return answers
+    hashes = {r['id']: rule_hash(r) for r in all_rules}
+    with open(progress_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A torn final line from a dropped run
+                continue
+            if entry.get("word") == word and hashes.get(entry.get("ruleId")) == entry.get("ruleHash"):
+                answers[entry["ruleId"]] = {
+                    "ruleId": entry["ruleId"], "result": entry["result"], "reason": entry["reason"]
+                }
+    return answers
+
+def validate_word_streaming(word, api_key=None, all_rules=None, session=None, rate_limiter=None,
+                            api_url=None, progress_path=None, max_rounds=3, on_result=None, timing_log=None):
+    """Validate a word over a streamed completion, keeping each answer as soon as its line completes.
+
+    Answers are appended to progress_path as they arrive and reloaded on the next call, so a
+    dropped connection or restart only re-asks the missing rules. Each stream is read to
+    the end; rules the model skipped are re-requested afterwards (up to max_rounds in
+    total), so streaming never keeps fewer answers than a plain request.
+    on_result(question) is called for each new answer. Returns the answers as text in the
+    usual "ruleId: N, ..." format.
+    """
+    if not api_key:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not provided")
+    
+    if all_rules is None:
+        all_rules = get_all_rules()
+    
+    hashes = {r['id']: rule_hash(r) for r in all_rules}
+    answers = load_stream_progress(progress_path, word, all_rules)
+    if answers:
+        print(f"Resuming '{word}' with {len(answers)} rules already answered")
+
+    def record(q):
+        answers[q["ruleId"]] = q
+        if progress_path:
+            entry = dict(q, word=word, ruleHash=hashes[q["ruleId"]])
+            with _progress_lock:
+                with open(progress_path, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if on_result:
+            on_result(q)
+
+    for _ in range(max_rounds):
+        remaining = [r for r in all_rules if r['id'] not in answers]
+        if not remaining:
+            break
+        requested = {r['id'] for r in remaining}
+        messages = [
+            {"role": "system", "content": build_system_prompt(remaining)},
             {"role": "user", "content": word}
         ]
-    }
+        parser = StreamingRuleParser()
+        stream = stream_completion(messages, api_key, session=session, rate_limiter=rate_limiter,
+                                   api_url=api_url, timing_log=timing_log, label=word)
+        try:
+            for delta in stream:
+                for q in parser.feed(delta):
+                    if q["ruleId"] in requested and q["ruleId"] not in answers:
+                        record(q)
+            for q in parser.close():
+                if q["ruleId"] in requested and q["ruleId"] not in answers:
+                    record(q)
+            skipped = len(requested - set(answers))
+            if skipped:
+                print(f"Model skipped {skipped} rules for '{word}', re-requesting them")
+        except (requests.ConnectionError, requests.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            # Everything parsed so far is kept; the next round asks only for the rest
+            print(f"Stream for '{word}' dropped after {len(answers)} answers: {str(e)}")
+        finally:
+            stream.close()
+
+    return "\n".join(
+        f"ruleId: {q['ruleId']}, result: {'true' if q['result'] else 'false'}, reason: {q['reason']}"
+        for q in (answers[rule_id] for rule_id in sorted(answers))
+    )
+
+def validate_words_packed(words, api_key=None, all_rules=None, session=None, rate_limiter=None,
+                          api_url=None, timing_log=None):
+    """Validate several words in one request so the rule list is only sent once.
+
+    Returns the raw answer text; parse it with parse_validation_result(text, rules, words=words).
+    """
+    if not api_key:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not provided")
     
-    response = requests.post(url, headers=headers, json=data)
-    response.raise_for_status()
-    result = response.json()
+    if all_rules is None:
+        all_rules = get_all_rules()
+    
+    messages = [
+        {"role": "system", "content": build_packed_system_prompt(all_rules)},
+        {"role": "user", "content": "\n".join(words)}
+    ]
+    result = request_completion(messages, api_key, session=session, rate_limiter=rate_limiter,
+                                api_url=api_url, timing_log=timing_log, label=",".join(words))
     
     return result['choices'][0]['message']['content']
 
-def find_existing_word_file(word, output_dir):
-    """Find if the word already exists in any word_x.json file."""
+def find_existing_word_file(word, output_dir, index=None, db=None):
+    """Find if the word already exists in any word_x.json file.
+
+    With a WordIndex this is a single lookup; otherwise every file is parsed.
+    With a CorpusDB the word is looked up in the database instead of the files.
+    """
+    if db is not None:
+        word_id = db.get_word_id(word)
+        if word_id is None:
+            return None, None
+        return f"{db.path}#word_{word_id}", str(word_id)
+    if index is not None:
+        word_id = index.lookup(word)
+        if word_id is None:
+            return None, None
+        return os.path.join(output_dir, f"word_{word_id}.json"), str(word_id)
+    
     for file_path in glob.glob(os.path.join(output_dir, "word_*.json")):
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
@@ -84,13 +496,28 @@ def find_existing_word_file(word, output_dir):
             print(f"Error reading {file_path}: {str(e)}")
     return None, None
 
-def find_next_file_number(output_dir):
-    """Find the next available number for word_x.json"""
+def find_next_file_number(output_dir, index=None, word=None, db=None):
+    """Find the next available number for word_x.json
+
+    With a WordIndex (or a CorpusDB) the number is reserved atomically for word,
+    so concurrent validator processes never pick the same one.
+    """
+    if db is not None:
+        return db.allocate_id(word)
+    if index is not None:
+        return index.allocate_id(word)
     i = 1
     while os.path.exists(os.path.join(output_dir, f"word_{i}.json")):
         i += 1
     return i
 
+def missing_reason(rule_id):
+    """Placeholder reason for a rule the model did not answer."""
+    return f"未获得对规则 {rule_id} 的回答"
+
+def is_answered(question):
+    return question["reason"] != missing_reason(question["ruleId"])
+
 def clean_reason_text(text):
     """Clean reason text to ensure it's on a single line."""
     # Replace newlines, tabs with spaces
@@ -100,12 +527,8 @@ def clean_reason_text(text):
     # Trim whitespace
     return text.strip()
 
-def parse_validation_result(text, all_rules=None):
-    """Parse the validation result text into a structured format."""
-    if all_rules is None:
-        all_rules = get_all_rules()
-    
-    # Create a dictionary of all rules with default values
+def _default_rule_questions(all_rules):
+    """A placeholder answer for every rule, keyed by rule ID."""
     rule_questions = {}
     for rule in all_rules:
         rule_id = rule.get('id')
@@ -113,28 +536,31 @@ def parse_validation_result(text, all_rules=None):
             rule_questions[rule_id] = {
                 "ruleId": rule_id,
                 "result": False,
-                "reason": f"未获得对规则 {rule_id} 的回答"
+                "reason": missing_reason(rule_id)
             }
+    return rule_questions
+
+def parse_validation_result(text, all_rules=None, words=None):
+    """Parse the validation result text into a structured format.
+
+    When words is given the text is a packed answer ("word: X, ruleId: N, ...") and the
+    result is {word: questions}. Pairs the model skipped keep the placeholder reason;
+    find_missing_pairs() lists them for a retry.
+    """
+    if all_rules is None:
+        all_rules = get_all_rules()
     
-    # Look for lines with ruleId, result, and reason
-    pattern = r'ruleId:\s*(\d+),\s*result:\s*(true|false),\s*reason:\s*(.+)'
+    if words is not None:
+        return _parse_packed_result(text, all_rules, words)
+    
+    # Create a dictionary of all rules with default values
+    rule_questions = _default_rule_questions(all_rules)
     
+    # Look for lines with ruleId, result, and reason
     for line in text.split('\n'):
-        match = re.search(pattern, line, re.IGNORECASE)
-        if match:
-            rule_id, result, reason = match.groups()
-            try:
-                rule_id = int(rule_id)
-                # Clean reason text to ensure it's on a single line
-                clean_reason = clean_reason_text(reason)
-                rule_questions[rule_id] = {
-                    "ruleId": rule_id,
-                    "result": result.lower() == "true",
-                    "reason": clean_reason
-                }
-            except (ValueError, KeyError):
-                # Skip if rule_id is not a valid integer or not in our rules
-                continue
+        question = parse_rule_line(line)
+        if question:
+            rule_questions[question["ruleId"]] = question
     
     # Convert dictionary to list ordered by rule ID
     questions = []
@@ -143,23 +569,79 @@ def parse_validation_result(text, all_rules=None):
     
     return questions
 
-def save_result(word, result, output_dir, file_id=None):
-    """Save the validation result to a JSON file."""
-    os.makedirs(output_dir, exist_ok=True)
+def _parse_packed_result(text, all_rules, words):
+    """Demultiplex a packed multi-word answer into {word: questions}."""
+    by_word = {word: _default_rule_questions(all_rules) for word in words}
+    pattern = r'word:\s*([^,，]+?)\s*[,，]\s*ruleId:\s*(\d+),\s*result:\s*(true|false),\s*reason:\s*(.+)'
+    
+    for line in text.split('\n'):
+        match = re.search(pattern, line, re.IGNORECASE)
+        if not match:
+            continue
+        word, rule_id, result, reason = match.groups()
+        word = word.strip().strip('"\'“”')
+        rule_id = int(rule_id)
+        # Ignore words we did not ask about and rules outside the requested set
+        if word not in by_word or rule_id not in by_word[word]:
+            continue
+        by_word[word][rule_id] = {
+            "ruleId": rule_id,
+            "result": result.lower() == "true",
+            "reason": clean_reason_text(reason)
+        }
     
+    return {word: [qs[rule_id] for rule_id in sorted(qs)] for word, qs in by_word.items()}
+
+def find_missing_pairs(results_by_word):
+    """List (word, ruleId) pairs that were not answered in a packed result."""
+    return [(word, q["ruleId"]) for word, questions in results_by_word.items()
+            for q in questions if not is_answered(q)]
+
+def timed_parse(text, all_rules, timing_log=None, label=None, words=None):
+    """parse_validation_result, writing a "parse" entry to the timing log if one is given."""
+    start = time.perf_counter()
+    result = parse_validation_result(text, all_rules, words=words)
+    if timing_log is not None:
+        questions = [q for qs in result.values() for q in qs] if words is not None else result
+        answered = sum(1 for q in questions if is_answered(q))
+        timing_log.record('parse', label=label, parse_time=time.perf_counter() - start,
+                          rules=len(questions), answered=answered, missing=len(questions) - answered)
+    return result
+
+def write_word_file(output_file, data):
+    """Write a word file with each rule on one line.
+
+    Written to a temp file and renamed so an interrupted run never leaves truncated JSON.
+    Keys other than id, word and questions (e.g. word_en) are kept.
+    """
+    questions = [
+        # Use single quotes in reason
+        {"ruleId": q["ruleId"], "result": bool(q["result"]), "reason": q["reason"].replace('"', "'")}
+        for q in data["questions"]
+    ]
+    tmp_file = f"{output_file}.tmp.{os.getpid()}.{threading.get_ident()}"
+    with open(tmp_file, 'wb') as f:
+        f.write(word_lines_json_bytes(dict(data, questions=questions)))
+    os.replace(tmp_file, output_file)
+
+def save_result(word, result, output_dir, file_id=None, all_rules=None, cache=None, index=None, db=None,
+                timing_log=None):
+    """Save the validation result to a JSON file (and the answer cache, if given)."""
     # Get all rules for complete validation
-    all_rules = get_all_rules()
+    if all_rules is None:
+        all_rules = get_all_rules()
     
     # Parse the validation result
-    questions = parse_validation_result(result, all_rules)
-    
+    questions = timed_parse(result, all_rules, timing_log, word)
+    return save_questions(word, questions, output_dir, file_id, all_rules, cache, index, db)
+
+def save_questions(word, questions, output_dir, file_id=None, all_rules=None, cache=None, index=None, db=None):
+    """Save parsed questions for a word to a JSON file or CorpusDB (and the answer cache, if given)."""
     # Determine file number/id
     if file_id is not None:
         file_number = file_id
     else:
-        file_number = find_next_file_number(output_dir)
-        
-    output_file = os.path.join(output_dir, f"word_{file_number}.json")
+        file_number = find_next_file_number(output_dir, index, word, db)
     
     # Create output structure matching the existing format
     output_data = {
@@ -167,51 +649,379 @@ def save_result(word, result, output_dir, file_id=None):
         "word": word,
         "questions": questions
     }
+    if db is not None:
+        output_file = f"{db.path}#word_{file_number}"
+        existing = db.get_word(file_number) or {}
+        db.save_word({**existing, **output_data})
+    else:
+        os.makedirs(output_dir, exist_ok=True)
+        output_file = os.path.join(output_dir, f"word_{file_number}.json")
+        write_word_file(output_file, output_data)
+        if index is not None:
+            index.record_file(file_number)
     
-    # Custom JSON formatting to ensure each rule is on one line
-    with open(output_file, 'w', encoding='utf-8') as f:
-        f.write("{\n")
-        f.write(f'  "id": "{file_number}",\n')
-        f.write(f'  "word": "{word}",\n')
-        f.write('  "questions": [\n')
-        
-        for i, q in enumerate(questions):
-            rule_id = q["ruleId"]
-            result_str = "true" if q["result"] else "false"
-            reason = q["reason"].replace('"', "'")  # Use single quotes in reason
-            
-            line = f'    {{"ruleId": {rule_id}, "result": {result_str}, "reason": "{reason}"}}'
-            if i < len(questions) - 1:
-                line += ","
-            f.write(line + "\n")
-            
-        f.write("  ]\n")
-        f.write("}\n")
+    answered = [q for q in questions if is_answered(q)]
+    if cache is not None:
+        cache.put_many(word, answered, all_rules if all_rules is not None else get_all_rules(), MODEL)
     
     # Print statistics
-    answered = sum(1 for q in questions if q["reason"] != f"未获得对规则 {q['ruleId']} 的回答")
-    print(f"Validation complete: {answered}/{len(questions)} rules answered")
+    print(f"Validation complete: {len(answered)}/{len(questions)} rules answered")
     
     return output_file
 
-def validate_word_by_id(word_id, output_dir, api_key=None):
-    """Validate a specific word by its ID."""
+def load_word_file(word_id, output_dir, db=None):
+    """Load word_<id>.json, raising ValueError if it is missing or has no word."""
+    if db is not None:
+        word_file = f"{db.path}#word_{word_id}"
+        data = db.get_word(word_id)
+        if not data or not data.get("word"):
+            raise ValueError(f"No word found in {word_file}")
+        return word_file, data
     word_file = os.path.join(output_dir, f"word_{word_id}.json")
     if not os.path.exists(word_file):
         raise ValueError(f"File {word_file} does not exist")
         
     with open(word_file, 'r', encoding='utf-8') as f:
         data = json.load(f)
-        word = data.get("word")
-        if not word:
-            raise ValueError(f"No word found in {word_file}")
+    if not data.get("word"):
+        raise ValueError(f"No word found in {word_file}")
+    return word_file, data
+
+def validate_word_by_id(word_id, output_dir, api_key=None, cache=None, index=None, db=None, **request_options):
+    """Validate a specific word by its ID.
+
+    request_options are passed through to validate_word (all_rules, session, rate_limiter, api_url).
+    """
+    word_file, data = load_word_file(word_id, output_dir, db)
+    word = data["word"]
         
     print(f"Validating existing word '{word}' from {word_file}")
-    result = validate_word(word, api_key)
-    output_file = save_result(word, result, output_dir, word_id)
+    progress_path = stream_progress_path(output_dir, word) if request_options.get('stream') else None
+    result = validate_word(word, api_key, progress_path=progress_path, **request_options)
+    output_file = save_result(word, result, output_dir, word_id, request_options.get('all_rules'), cache, index, db,
+                              request_options.get('timing_log'))
+    if progress_path and os.path.exists(progress_path):
+        os.remove(progress_path)
     print(f"Validation result saved to: {output_file}")
     return True
 
+def revalidate_word_incremental(word_id, output_dir, api_key=None, cache=None, index=None, db=None,
+                                **request_options):
+    """Re-ask only the rules whose cached answer is missing or outdated, then merge into the word file.
+
+    Only the stale rules are replaced; every other answer in the file is kept, so
+    cells corrected by hand in the editor survive. An unchanged word costs no API call.
+    """
+    all_rules = request_options.pop('all_rules', None) or get_all_rules(db)
+    word_file, data = load_word_file(word_id, output_dir, db)
+    word = data["word"]
+
+    stale = cache.stale_rules(word, all_rules, MODEL)
+    fresh = {}
+    if stale:
+        print(f"Revalidating {len(stale)}/{len(all_rules)} stale rules for '{word}' ({word_file})")
+        progress_path = stream_progress_path(output_dir, word) if request_options.get('stream') else None
+        result = validate_word(word, api_key, all_rules=stale, progress_path=progress_path, **request_options)
+        parsed = timed_parse(result, stale, request_options.get('timing_log'), word)
+        answered = [q for q in parsed if is_answered(q)]
+        cache.put_many(word, answered, stale, MODEL)
+        fresh = {q["ruleId"]: q for q in answered}
+        if progress_path and os.path.exists(progress_path):
+            os.remove(progress_path)
+        if len(answered) < len(stale):
+            print(f"Warning: {len(stale) - len(answered)} rules for '{word}' still unanswered")
+
+    cached = cache.get_many(word, all_rules, MODEL)
+    existing = {q.get("ruleId"): q for q in data.get("questions", [])}
+    merged = {}
+    for rule in all_rules:
+        rule_id = rule['id']
+        if rule_id in fresh:
+            merged[rule_id] = fresh[rule_id]
+        elif rule_id in existing and existing[rule_id].get("reason") != missing_reason(rule_id):
+            # The file wins over the cache: it may hold an edit made after the answer was cached
+            merged[rule_id] = existing[rule_id]
+        else:
+            # Fall back to the old answer (or a placeholder) until the rule is answered again
+            merged[rule_id] = (cached.get(rule_id) or existing.get(rule_id) or
+                               {"ruleId": rule_id, "result": False, "reason": missing_reason(rule_id)})
+    # Answers for ids outside the current catalog are left untouched
+    for rule_id, q in existing.items():
+        if isinstance(rule_id, int) and rule_id not in merged:
+            merged[rule_id] = q
+    questions = [merged[rule_id] for rule_id in sorted(merged)]
+
+    if questions != data.get("questions"):
+        data["questions"] = questions
+        if db is not None:
+            db.save_word(data)
+        else:
+            write_word_file(word_file, data)
+            if index is not None:
+                index.record_file(word_id)
+    return True
+
+def validate_word_ids_packed(word_ids, output_dir, api_key=None, cache=None, index=None, db=None,
+                             **request_options):
+    """Validate a batch of words with one packed request, then re-ask skipped pairs per word.
+
+    The retry only sends the rules that word skipped (sharded like validate_word if shards > 1).
+    """
+    all_rules = request_options.pop('all_rules', None) or get_all_rules(db)
+    shards = request_options.pop('shards', 1)
+    stream = request_options.pop('stream', False)
+
+    ids_by_word = {}
+    for word_id in word_ids:
+        _, data = load_word_file(word_id, output_dir, db)
+        ids_by_word.setdefault(data["word"], []).append(word_id)
+    words = list(ids_by_word)
+
+    print(f"Validating {len(words)} words in one request: {', '.join(words)}")
+    text = validate_words_packed(words, api_key, all_rules, **request_options)
+    results = timed_parse(text, all_rules, request_options.get('timing_log'), ",".join(words), words=words)
+
+    rules_by_id = {r['id']: r for r in all_rules}
+    missing_by_word = {}
+    for word, rule_id in find_missing_pairs(results):
+        missing_by_word.setdefault(word, []).append(rules_by_id[rule_id])
+
+    for word, rules in missing_by_word.items():
+        print(f"Retrying {len(rules)} skipped rules for '{word}'")
+        retry_text = validate_word(word, api_key, rules, shards=shards, stream=stream, **request_options)
+        retried = timed_parse(retry_text, rules, request_options.get('timing_log'), word)
+        answered = {q["ruleId"]: q for q in retried if is_answered(q)}
+        results[word] = [answered.get(q["ruleId"], q) for q in results[word]]
+
+    for word, ids in ids_by_word.items():
+        for word_id in ids:
+            save_questions(word, results[word], output_dir, word_id, all_rules, cache, index, db)
+    return True
+
+def seed_cache(output_dir, cache, all_rules=None):
+    """Record the answers already in the word files as valid for the current rule text."""
+    if all_rules is None:
+        all_rules = get_all_rules()
+    count = 0
+    for file_path in glob.glob(os.path.join(output_dir, "word_*.json")):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Error reading {file_path}: {str(e)}")
+            continue
+        answered = [
+            {"ruleId": q["ruleId"], "result": q["result"] is True or str(q["result"]).lower() == "true",
+             "reason": q.get("reason", "")}
+            for q in data.get("questions", []) if "ruleId" in q and "reason" in q and is_answered(q)
+        ]
+        count += cache.put_many(data.get("word"), answered, all_rules, MODEL)
+    return count
+
+def run_signature(word_ids, all_rules, **options):
+    """Hash of the words, rules, model and options of a bulk run, to tell its journal apart."""
+    payload = json.dumps({
+        "ids": sorted(word_ids),
+        "model": MODEL,
+        "rules": {r['id']: rule_hash(r) for r in all_rules},
+        "options": options,
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+class ProgressJournal:
+    """Append-only JSONL record of finished word IDs so bulk runs can resume.
+
+    The first line holds the run's signature. A journal left by a run with another
+    signature (other ids, options, model or rules) is discarded instead of resumed.
+    """
+
+    def __init__(self, path, signature=None):
+        self.path = path
+        self.signature = signature
+        self._lock = threading.Lock()
+        self.completed = set()
+        if os.path.exists(path):
+            found = None
+            completed = set()
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A torn final line from an interrupted run
+                        continue
+                    if 'signature' in entry:
+                        found = entry['signature']
+                    elif entry.get('status') == 'ok':
+                        completed.add(entry['id'])
+            if found == signature:
+                self.completed = completed
+            else:
+                print(f"Ignoring {path}: it was written by a different run")
+                os.remove(path)
+        if not os.path.exists(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({"signature": signature}) + "\n")
+
+    def record(self, word_id, status, error=None):
+        entry = {"id": word_id, "status": status, "time": time.time()}
+        if error:
+            entry["error"] = error
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                f.flush()
+            if status == 'ok':
+                self.completed.add(word_id)
+
+class TimingLog:
+    """Append-only JSONL log of API calls and answer parsing, with running totals.
+
+    "request" entries carry queue_wait (rate limiter), http_latency, backoff,
+    attempts, status and token usage; "parse" entries carry parse_time and the
+    number of rules answered and missing.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self.totals = {}
+
+    def record(self, event, **fields):
+        entry = {"event": event, "time": time.time()}
+        entry.update(fields)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            totals = self.totals.setdefault(event, {"count": 0})
+            totals["count"] += 1
+            for key, value in fields.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    totals[key] = totals.get(key, 0) + value
+
+    def summary(self):
+        requests_ = self.totals.get('request', {})
+        parses = self.totals.get('parse', {})
+        return (f"{requests_.get('count', 0)} requests ({requests_.get('attempts', 0)} attempts), "
+                f"{requests_.get('total_tokens', 0)} tokens "
+                f"({requests_.get('prompt_tokens', 0)} prompt, {requests_.get('completion_tokens', 0)} completion); "
+                f"queue wait {requests_.get('queue_wait', 0):.1f}s, HTTP {requests_.get('http_latency', 0):.1f}s, "
+                f"backoff {requests_.get('backoff', 0):.1f}s, parse {parses.get('parse_time', 0):.2f}s; "
+                f"{parses.get('answered', 0)} rules answered, {parses.get('missing', 0)} missing")
+
+class CallTiming:
+    """Accumulates the timings of one API call (over its retries) for a TimingLog."""
+
+    def __init__(self, timing_log, label, kind, estimated_tokens):
+        self.timing_log = timing_log
+        self.fields = {"label": label, "kind": kind, "estimated_tokens": estimated_tokens,
+                       "queue_wait": 0.0, "http_latency": 0.0, "backoff": 0.0}
+        self.attempts = 0
+
+    @contextmanager
+    def measure(self, field):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.fields[field] += time.perf_counter() - start
+
+    def backoff(self, delay):
+        time.sleep(delay)
+        self.fields["backoff"] += delay
+
+    def record(self, usage=None, **fields):
+        if self.timing_log is None:
+            return
+        entry = dict(self.fields, attempts=self.attempts, **fields)
+        for key in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+            if usage and usage.get(key) is not None:
+                entry[key] = usage[key]
+        self.timing_log.record('request', **entry)
+
+def validate_words_bulk(word_ids, output_dir, api_key=None, workers=4, requests_per_minute=None,
+                        tokens_per_minute=None, journal_path=None, api_url=None, cache=None,
+                        incremental=False, pack_words=1, shards=1, stream=False, index=None, db=None,
+                        timing_log=None):
+    """Validate many words concurrently with a shared session and rate limiter.
+
+    Words already recorded as done in the journal are skipped, if the journal was written
+    by a run with the same ids, options, model and rules. With incremental=True
+    (which needs a cache) only stale (word, rule) pairs are sent. pack_words > 1 sends
+    that many words per request; shards > 1 splits each word's rules over parallel
+    requests; stream=True parses answers as they arrive. With a CorpusDB, words and
+    rules are read from and written to the database instead of the JSON files.
+    A TimingLog records every API call and parse. Returns (success, total).
+    """
+    if incremental and pack_words > 1:
+        raise ValueError("Word packing is not supported with incremental validation")
+    if not api_key:
+        api_key = os.environ.get('OPENAI_API_KEY')
+        if not api_key:
+            raise ValueError("OpenAI API key not provided")
+
+    all_rules = get_all_rules(db)
+    journal = None
+    if journal_path:
+        signature = run_signature(word_ids, all_rules, incremental=incremental, pack_words=pack_words,
+                                  shards=shards, stream=stream, db=db is not None)
+        journal = ProgressJournal(journal_path, signature)
+    pending = [i for i in word_ids if not journal or i not in journal.completed]
+    if journal and len(pending) < len(word_ids):
+        print(f"Resuming: {len(word_ids) - len(pending)} words already done according to {journal_path}")
+
+    session = create_session(pool_size=workers * max(shards, 1))
+    rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+    success_count = len(word_ids) - len(pending)
+
+    if pack_words > 1:
+        batches = [pending[i:i + pack_words] for i in range(0, len(pending), pack_words)]
+        validate = validate_word_ids_packed
+    else:
+        batches = [[word_id] for word_id in pending]
+        single = revalidate_word_incremental if incremental else validate_word_by_id
+        validate = lambda ids, *args, **kwargs: single(ids[0], *args, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {
+            executor.submit(validate, batch, output_dir, api_key, cache=cache, index=index, db=db,
+                            all_rules=all_rules, session=session, rate_limiter=rate_limiter, api_url=api_url,
+                            shards=shards, stream=stream, timing_log=timing_log): batch
+            for batch in batches
+        }
+        for future in as_completed(futures):
+            batch = futures[future]
+            try:
+                future.result()
+                success_count += len(batch)
+                if journal:
+                    for word_id in batch:
+                        journal.record(word_id, 'ok')
+            except Exception as e:
+                print(f"Error validating {', '.join(f'word_{i}.json' for i in batch)}: {str(e)}")
+                if journal:
+                    for word_id in batch:
+                        journal.record(word_id, 'error', str(e))
+
+    session.close()
+    # A finished run starts fresh next time; only interrupted or failed runs resume
+    if journal and success_count == len(word_ids) and os.path.exists(journal_path):
+        os.remove(journal_path)
+    return success_count, len(word_ids)
+
+def lint_word_files(output_dir, filenames):
+    """Lint word files after a run (see corpus_lint.py), printing errors and a summary."""
+    linter = CorpusLinter(output_dir, DEFAULT_RULES_DIR, default_lint_cache_path(output_dir))
+    try:
+        report = linter.lint(filenames)
+    finally:
+        linter.close()
+    for issue in report['issues']:
+        if issue['severity'] == 'error':
+            print(f"Lint error in {issue.get('file', '-')}: {issue['message']}")
+    print(f"Lint: {lint_summary(report)}")
+    return report
+
 def parse_word_ids(word_ids_str):
     """Parse a string of comma-separated IDs and ranges into a list of IDs."""
     ids = []
@@ -248,14 +1058,55 @@ def main():
     parser.add_argument('--output-dir', default='words_zh', help='Directory to save results')
     parser.add_argument('--force', action='store_true', help='Force overwrite if word already exists')
     parser.add_argument('--word-id', help='Validate specific word_x.json file(s). Accepts single IDs, comma-separated IDs, and ranges (e.g. "1,3,5-8")')
+    parser.add_argument('--workers', type=int, default=4, help='Concurrent requests when validating by --word-id')
+    parser.add_argument('--rpm', type=int, help='Maximum requests per minute (default: unlimited)')
+    parser.add_argument('--tpm', type=int, help='Maximum tokens per minute (default: unlimited)')
+    parser.add_argument('--journal', help='Progress journal for resumable --word-id runs (default: <output-dir>/.validation_journal.jsonl); a journal from a run with other ids or options is ignored')
+    parser.add_argument('--no-journal', action='store_true', help='Do not read or write the progress journal')
+    parser.add_argument('--api-url', help='Chat completions URL (or set OPENAI_API_URL env var)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Answer cache file (default: .validation_cache.sqlite3 next to this script)')
+    parser.add_argument('--no-cache', action='store_true', help='Do not read or write the answer cache')
+    parser.add_argument('--incremental', action='store_true', help='Only re-ask rules whose cached answer is missing or outdated (all words unless --word-id is given)')
+    parser.add_argument('--pack-words', type=int, default=1, help='Words per request when validating by --word-id (shares one copy of the rule prompt)')
+    parser.add_argument('--shards', type=int, default=1, help='Split the rules of each word over this many parallel requests')
+    parser.add_argument('--stream', action='store_true', help='Stream answers and keep each rule as soon as it arrives (resumable per word)')
+    parser.add_argument('--seed-cache', action='store_true', help='Record the answers already in the word files as current, then exit')
+    parser.add_argument('--timing-log', help='Append a JSON line per API call and per parse (queue wait, HTTP latency, tokens, parse time, rules answered) to this file')
+    parser.add_argument('--profile', help='Sample the stacks of all threads during the run and write them to this file (collapsed-stack format)')
+    parser.add_argument('--no-lint', action='store_true', help='Do not lint the saved word files after the run')
+    parser.add_argument('--db', help='Read and write words in this SQLite corpus (see corpus_db.py) instead of --output-dir')
     
     args = parser.parse_args()
+    timing_log = TimingLog(args.timing_log) if args.timing_log else None
+    sampler = StackSampler().start() if args.profile else None
     
     try:
         # Set up output directory
         output_dir = os.path.join(os.path.dirname(__file__), args.output_dir)
         os.makedirs(output_dir, exist_ok=True)
         
+        cache = None if args.no_cache else ValidationCache(args.cache)
+        db = CorpusDB(args.db) if args.db else None
+        index = None if db else WordIndex(output_dir)
+        if (args.incremental or args.seed_cache) and cache is None:
+            parser.error("--incremental and --seed-cache need the answer cache")
+        
+        if args.seed_cache:
+            if db is not None:
+                parser.error("--seed-cache reads the word files; run it without --db")
+            count = seed_cache(output_dir, cache)
+            print(f"Seeded cache with {count} answers from {output_dir}")
+            return
+        
+        # Incremental runs without --word-id cover every word file
+        if args.incremental and args.word_id is None and db is not None:
+            args.word_id = ",".join(str(i) for i in db.word_ids())
+        elif args.incremental and args.word_id is None:
+            args.word_id = ",".join(
+                os.path.basename(p)[len("word_"):-len(".json")]
+                for p in glob.glob(os.path.join(output_dir, "word_*.json"))
+            )
+        
         # If word-id is provided, we use those specific files
         if args.word_id is not None:
             word_ids = parse_word_ids(args.word_id)
@@ -263,16 +1114,30 @@ def main():
                 raise ValueError("No valid word IDs provided")
                 
             print(f"Bulk validating {len(word_ids)} words...")
-            success_count = 0
+            journal_path = None
+            if not args.no_journal:
+                journal_path = args.journal or os.path.join(output_dir, '.validation_journal.jsonl')
             
-            for word_id in word_ids:
-                try:
-                    if validate_word_by_id(word_id, output_dir, args.api_key):
-                        success_count += 1
-                except Exception as e:
-                    print(f"Error validating word_{word_id}.json: {str(e)}")
+            success_count, total = validate_words_bulk(
+                word_ids, output_dir, args.api_key,
+                workers=args.workers,
+                requests_per_minute=args.rpm,
+                tokens_per_minute=args.tpm,
+                journal_path=journal_path,
+                api_url=args.api_url,
+                cache=cache,
+                incremental=args.incremental,
+                pack_words=args.pack_words,
+                shards=args.shards,
+                stream=args.stream,
+                index=index,
+                db=db,
+                timing_log=timing_log
+            )
             
-            print(f"Bulk validation complete: {success_count}/{len(word_ids)} words processed successfully")
+            print(f"Bulk validation complete: {success_count}/{total} words processed successfully")
+            if db is None and not args.no_lint:
+                lint_word_files(output_dir, [f"word_{i}.json" for i in word_ids])
             return
         
         # If no word-id is provided, we need a word argument
@@ -280,7 +1145,7 @@ def main():
             parser.error("the following arguments are required: word (unless --word-id is specified)")
         
         # Check if word already exists
-        existing_file, existing_id = find_existing_word_file(args.word, output_dir)
+        existing_file, existing_id = find_existing_word_file(args.word, output_dir, index, db)
         
         if existing_file and not args.force:
             print(f"Word '{args.word}' already exists in {existing_file}")
@@ -288,18 +1153,36 @@ def main():
             return
             
         # Validate the word
-        result = validate_word(args.word, args.api_key)
+        progress_path = stream_progress_path(output_dir, args.word) if args.stream else None
+        all_rules = get_all_rules(db)
+        result = validate_word(args.word, args.api_key, all_rules, api_url=args.api_url, shards=args.shards,
+                               stream=args.stream, progress_path=progress_path, timing_log=timing_log)
         
         # Save the result
         if existing_file:
-            output_file = save_result(args.word, result, output_dir, existing_id)
+            output_file = save_result(args.word, result, output_dir, existing_id, all_rules, cache, index, db,
+                                      timing_log)
             print(f"Updated existing word in: {output_file}")
         else:
-            output_file = save_result(args.word, result, output_dir)
+            output_file = save_result(args.word, result, output_dir, all_rules=all_rules, cache=cache, index=index, db=db,
+                                      timing_log=timing_log)
             print(f"Validation result saved to: {output_file}")
+        if progress_path and os.path.exists(progress_path):
+            os.remove(progress_path)
+        if db is None and not args.no_lint:
+            lint_word_files(output_dir, [os.path.basename(output_file)])
         
     except Exception as e:
         print(f"Error: {str(e)}")
+    finally:
+        if timing_log is not None:
+            print(f"Timing: {timing_log.summary()}")
+        if sampler is not None:
+            sampler.stop()
+            sampler.write(args.profile)
+            print(f"Profile written to {args.profile}; busiest frames:")
+            for frame, share in sampler.top():
+                print(f"  {share:6.1%}  {frame}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
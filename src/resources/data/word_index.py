@@ -0,0 +1,220 @@
+"""
+Persistent index of the word files: word text -> id, plus a content hash per file.
+
+The index is a SQLite file next to the words directory. Lookups are a single
+indexed query instead of parsing every word_*.json, and new ids are allocated
+inside a write transaction (SQLite's database file lock), so two validator
+processes can never hand out the same id. Opening the index re-stats the words
+directory, so files added or edited outside the tools (git pull, hand edits) are
+picked up before the first lookup.
+
+Usage:
+    python word_index.py rebuild [--words-dir DIR]
+    python word_index.py verify [--words-dir DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+
+DEFAULT_WORDS_DIR = os.path.join(os.path.dirname(__file__), 'words_zh')
+WORD_FILE_PATTERN = re.compile(r'^word_(\d+)\.json$')
+
+
+def default_index_path(words_dir):
+    """.<dirname>_index.sqlite3 next to the words directory."""
+    words_dir = os.path.abspath(words_dir)
+    return os.path.join(os.path.dirname(words_dir), f".{os.path.basename(words_dir)}_index.sqlite3")
+
+
+def word_file_path(words_dir, word_id):
+    return os.path.join(words_dir, f"word_{word_id}.json")
+
+
+class WordIndex:
+    """word text / id / content hash for every word file, safe to share between threads."""
+
+    def __init__(self, words_dir, path=None):
+        self.words_dir = words_dir
+        self.path = path or default_index_path(words_dir)
+        self._lock = threading.Lock()
+        # isolation_level=None: transactions are managed explicitly below
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False,
+                                     isolation_level=None)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS words (
+                id INTEGER PRIMARY KEY,
+                word TEXT,
+                content_hash TEXT,
+                mtime_ns INTEGER,
+                size INTEGER
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS words_word ON words (word)")
+        if not os.path.isdir(words_dir):
+            return
+        if self._conn.execute("SELECT COUNT(*) FROM words").fetchone()[0] == 0:
+            self.rebuild()
+        else:
+            # Pick up files added or edited outside the index (git pull, hand edits, exports)
+            self.sync()
+
+    def _read_file(self, word_id):
+        """(word, content_hash, mtime_ns, size) for a word file, or None if it is missing."""
+        path = word_file_path(self.words_dir, word_id)
+        try:
+            stat = os.stat(path)
+            with open(path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None
+        try:
+            word = json.loads(raw).get('word')
+        except (ValueError, AttributeError):
+            word = None
+        return word, hashlib.sha256(raw).hexdigest(), stat.st_mtime_ns, stat.st_size
+
+    def _disk_ids(self):
+        ids = []
+        for name in os.listdir(self.words_dir):
+            match = WORD_FILE_PATTERN.match(name)
+            if match:
+                ids.append(int(match.group(1)))
+        return sorted(ids)
+
+    def lookup(self, word):
+        """Lowest id whose file holds this word, or None."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(id) FROM words WHERE word = ? AND content_hash IS NOT NULL", (word,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def get(self, word_id):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, word, content_hash FROM words WHERE id = ?", (int(word_id),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "word": row[1], "content_hash": row[2]}
+
+    def record_file(self, word_id):
+        """Re-read one word file into the index (or drop it if the file is gone)."""
+        info = self._read_file(word_id)
+        with self._lock:
+            if info is None:
+                self._conn.execute("DELETE FROM words WHERE id = ?", (int(word_id),))
+            else:
+                self._conn.execute("INSERT OR REPLACE INTO words VALUES (?, ?, ?, ?, ?)",
+                                   (int(word_id), *info))
+
+    def allocate_id(self, word):
+        """Reserve the next free id for word.
+
+        The reservation row has no content hash until record_file() is called for it.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                word_id = (self._conn.execute("SELECT MAX(id) FROM words").fetchone()[0] or 0) + 1
+                # Files written by tools that bypass the index must not be overwritten
+                while os.path.exists(word_file_path(self.words_dir, word_id)):
+                    word_id += 1
+                self._conn.execute("INSERT INTO words (id, word) VALUES (?, ?)", (word_id, word))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return word_id
+
+    def sync(self):
+        """Re-index files whose mtime or size changed; stat-only for unchanged files.
+
+        Returns the number of ids updated or removed.
+        """
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in self._conn.execute(
+                "SELECT id, mtime_ns, size FROM words WHERE content_hash IS NOT NULL")}
+        changed = 0
+        disk_ids = set(self._disk_ids())
+        for word_id in disk_ids:
+            stat = os.stat(word_file_path(self.words_dir, word_id))
+            if known.get(word_id) != (stat.st_mtime_ns, stat.st_size):
+                self.record_file(word_id)
+                changed += 1
+        for word_id in set(known) - disk_ids:
+            self.record_file(word_id)
+            changed += 1
+        return changed
+
+    def rebuild(self):
+        """Drop the index and re-read every word file. Returns the number of files indexed."""
+        rows = []
+        for word_id in self._disk_ids():
+            info = self._read_file(word_id)
+            if info is not None:
+                rows.append((word_id, *info))
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.execute("DELETE FROM words")
+            self._conn.executemany("INSERT INTO words VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def verify(self):
+        """Compare the index with the files on disk; return a list of problem descriptions."""
+        problems = []
+        with self._lock:
+            indexed = {row[0]: (row[1], row[2]) for row in self._conn.execute(
+                "SELECT id, word, content_hash FROM words")}
+        disk_ids = self._disk_ids()
+        seen_words = {}
+        for word_id in disk_ids:
+            word, content_hash, _, _ = self._read_file(word_id)
+            if word_id not in indexed:
+                problems.append(f"word_{word_id}.json is not indexed")
+            elif indexed[word_id] != (word, content_hash):
+                problems.append(f"word_{word_id}.json changed since it was indexed")
+            if word in seen_words:
+                problems.append(f"word '{word}' is in both word_{seen_words[word]}.json and word_{word_id}.json")
+            else:
+                seen_words[word] = word_id
+        for word_id in sorted(set(indexed) - set(disk_ids)):
+            if indexed[word_id][1] is None:
+                problems.append(f"id {word_id} is reserved for '{indexed[word_id][0]}' but has no file")
+            else:
+                problems.append(f"word_{word_id}.json is indexed but missing")
+        return problems
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the word text -> id index.')
+    parser.add_argument('command', choices=['rebuild', 'verify'])
+    parser.add_argument('--words-dir', default=DEFAULT_WORDS_DIR, help='Directory holding word_N.json files')
+    parser.add_argument('--index', help='Index file (default: .<words dir>_index.sqlite3 next to it)')
+    args = parser.parse_args()
+
+    index = WordIndex(args.words_dir, args.index)
+    if args.command == 'rebuild':
+        count = index.rebuild()
+        print(f"Indexed {count} word files into {index.path}")
+    else:
+        problems = index.verify()
+        for problem in problems:
+            print(problem)
+        print(f"{len(problems)} problems found")
+        if problems:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
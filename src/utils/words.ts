@@ -1,31 +1,20 @@
-import { type Word } from '../types/word'
-import { LANGUAGE_CONFIG } from '../config/app-config'
+import { type Word, type WordQuestion } from '../types/word'
+import answersBundle from '../resources/data/game/answers.json'
 
 
-// Dynamically import all word files from the words directory
-const wordModules = (() => {
-  // This is a webpack feature that allows us to require all files matching a pattern
-  // @ts-ignore - require.context is a webpack feature not recognized by TypeScript
-  const context = require.context('../resources/data/words_zh', false, /\.json$/);
-  
-  // Get all file paths
-  const filePaths = context.keys();
-  
-  // Import each file and return the array of modules
-  return filePaths.map((path: string) => context(path));
-})();
+// Compact answers built from words_zh by src/resources/data/game_bundle.py (npm run build:data).
+// Reason text is kept out of the bundle, in shards under public/reasons.
+type WordRow = [string, string, string, string, number[]?]
 
-// Dynamically import all Chinese word files
-const wordModulesZh = (() => {
-  // @ts-ignore - require.context is a webpack feature not recognized by TypeScript
-  const context = require.context('../resources/data/words_zh', false, /\.json$/);
-  
-  // Get all file paths
-  const filePaths = context.keys();
-  
-  // Import each file and return the array of modules
-  return filePaths.map((path: string) => context(path));
-})();
+type AnswersBundle = {
+  version: number
+  ruleIds: number[]
+  shardSize: number
+  reasonShards: Record<string, string>
+  words: WordRow[]
+}
+
+const bundle = answersBundle as unknown as AnswersBundle
 
 // Fisher-Yates shuffle algorithm
 function shuffleArray<T>(array: T[]): T[] {
@@ -37,43 +26,32 @@ function shuffleArray<T>(array: T[]): T[] {
   return shuffled;
 }
 
-// Helper function to normalize word data
-function normalizeWordData(data: any): Word {
-  return {
-    id: data.id,
-    word: data.word,
-    word_en: data.word_en,
-    questions: data.questions.map((q: any) => ({
-      ruleId: q.ruleId,
-      result: typeof q.result === 'string' ? q.result.toLowerCase() === 'true' : q.result,
-      reason: q.reason
-    }))
-  };
+// Decode a word row: the bitset holds one answer per bundle.ruleIds entry, most significant bit first
+function decodeWordRow([id, word, word_en, bits, missing = []]: WordRow): Word {
+  const packed = atob(bits);
+  const unanswered = new Set(missing);
+  const questions: WordQuestion[] = [];
+  for (let i = 0; i < bundle.ruleIds.length; i++) {
+    const ruleId = bundle.ruleIds[i];
+    if (!unanswered.has(ruleId)) {
+      questions.push({ ruleId, result: (packed.charCodeAt(i >> 3) & (0x80 >> (i & 7))) !== 0 });
+    }
+  }
+  return { id, word, word_en, questions };
 }
 
-// Load all words from the imported modules
-const originalWords = wordModules.map((module: any) => normalizeWordData(module));
-const originalWordsZh = wordModulesZh.map((module: any) => normalizeWordData(module));
+// Load all words from the answers bundle
+const originalWords = bundle.words.map(decodeWordRow);
 
 export function getWords(): Word[] {
-  // Always use English data
-  const isChinese = false;
-  
-  // Get all words and shuffle them based on language
-  const words = isChinese ? originalWordsZh : originalWords;
-  return shuffleArray([...words]);
+  return shuffleArray([...originalWords]);
 }
 
 export function getWordById(id: string): Word | undefined {
-  // Always use English data
-  const isChinese = false;
-  
-  // Find word in the loaded words based on language
-  const words = isChinese ? originalWordsZh : originalWords;
-  return words.find((word: Word) => word.id === id);
+  return originalWords.find((word: Word) => word.id === id);
 }
 
 export function getWordAnswerForRule(word: Word, ruleId: number): boolean | undefined {
   const question = word.questions.find(q => q.ruleId === ruleId)
   return question?.result
-} 
\ No newline at end of file
+}
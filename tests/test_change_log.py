@@ -0,0 +1,102 @@
+"""
+Tests for the per-cell change log: baseline, deltas, conflicts and pruning.
+
+Run with:
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'resources', 'data'))
+
+from change_log import ChangeLog, ConflictError  # noqa: E402
+
+
+def word(word_id, answers, **fields):
+    data = {"id": str(word_id), "word": f"词{word_id}", **fields,
+            "questions": [{"ruleId": rule_id, "result": result, "reason": f"理由{rule_id}"}
+                          for rule_id, result in answers.items()]}
+    return (word_id, json.dumps(data, ensure_ascii=False).encode('utf-8'), data)
+
+
+@pytest.fixture
+def log(tmp_path):
+    log = ChangeLog(str(tmp_path / "changes.sqlite3"))
+    log.record_words([word(1, {1: True, 2: False}), word(2, {1: False, 2: True})])
+    return log
+
+
+def test_first_recording_is_a_baseline_without_history(log):
+    assert log.version() == 1
+    assert log.changes_since(1) == {"version": 1, "since": 1, "reset": False, "words": [], "cells": []}
+    # Nothing before the baseline can be replayed
+    assert log.changes_since(0)["reset"] is True
+
+
+def test_delta_lists_changed_cells_only(log):
+    log.record_words([word(1, {1: True, 2: True}), word(2, {1: False, 2: True})])
+
+    delta = log.changes_since(1)
+
+    assert delta["version"] == 2
+    assert delta["words"] == []
+    assert delta["cells"] == [{"wordId": "1", "ruleId": 2, "version": 2, "result": True, "reason": "理由2"}]
+
+
+def test_recording_the_same_state_again_adds_no_version(log):
+    log.record_words([word(1, {1: True, 2: True})])
+    log.record_words([word(1, {1: True, 2: True})])
+
+    assert log.version() == 2
+
+
+def test_word_fields_removed_cells_and_deleted_words(log):
+    log.record_words([word(1, {1: True}, word_en="one"), (2, None, None)])
+
+    delta = log.changes_since(1)
+
+    assert {w["wordId"]: w["deleted"] for w in delta["words"]} == {"1": False, "2": True}
+    assert [w for w in delta["words"] if w["wordId"] == "1"][0]["word_en"] == "one"
+    assert delta["cells"] == [{"wordId": "1", "ruleId": 2, "version": 2, "deleted": True}]
+    assert log.word_ids() == [1]
+
+
+def test_edit_based_on_an_old_version_conflicts_only_on_changed_cells(log):
+    log.record_words([word(1, {1: False, 2: False})])
+
+    with log.transaction():
+        log.check_cells([(1, 2), (2, 1)], 1)
+        with pytest.raises(ConflictError) as error:
+            log.check_cells([(1, 1), (2, 1)], 1)
+
+    assert error.value.version == 2
+    assert error.value.conflicts == [{"wordId": "1", "ruleId": 1, "result": False, "reason": "理由1", "version": 2}]
+
+
+def test_pruned_history_forces_a_reload(tmp_path):
+    log = ChangeLog(str(tmp_path / "changes.sqlite3"), history_limit=2)
+    log.record_words([word(1, {1: True, 2: True, 3: True})])
+    for result in [False, True, False]:
+        log.record_words([word(1, {1: result, 2: result, 3: True})])
+
+    assert log.version() == 4
+    assert log.changes_since(2)["reset"] is True
+    assert [c["ruleId"] for c in log.changes_since(3)["cells"]] == [1, 2]
+    with log.transaction():
+        with pytest.raises(ConflictError) as error:
+            log.check_cells([(1, 3)], 2)
+    assert error.value.conflicts == []
+
+
+def test_failed_transaction_records_nothing(log):
+    with pytest.raises(RuntimeError):
+        with log.transaction():
+            log.record_words([word(1, {1: False, 2: False})])
+            raise RuntimeError("write failed")
+
+    assert log.version() == 1
+    assert log.changes_since(1)["cells"] == []
@@ -0,0 +1,83 @@
+"""
+Server tests for the change log: versions served next to word data, and saves
+that fail part way.
+
+Run with:
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+import server  # noqa: E402
+from change_log import ChangeLog  # noqa: E402
+
+
+def make_store(corpus):
+    return server.DataStore(corpus['words'], server.RULES_DIR, None, change_log=ChangeLog(corpus['log']))
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    words_dir = tmp_path / "words_zh"
+    shutil.copytree(os.path.join(ROOT, server.WORDS_DIR), words_dir)
+    corpus = {'words': str(words_dir), 'log': str(tmp_path / ".words_zh_changes.sqlite3")}
+    monkeypatch.setattr(server, 'store', make_store(corpus))
+    return corpus
+
+
+def flipped(word_data, rule_id):
+    return not next(q['result'] for q in word_data['questions'] if q['ruleId'] == rule_id)
+
+
+def test_all_words_includes_every_save_counted_in_its_version(corpus):
+    client = server.app.test_client()
+    client.get('/api/words/all')
+    # Another server process, sharing the words directory and the change log
+    other = make_store(corpus)
+    word = other.get_word('5')
+    question = word['questions'][0]
+    question['result'] = not question['result']
+    with other.changes():
+        other.save_word('5', word)
+
+    response = client.get('/api/words/all').get_json()
+
+    served = next(w for w in response['words'] if w['id'] == '5')
+    assert response['version'] == other.change_log.version()
+    assert served['questions'][0]['result'] == question['result']
+
+
+def test_failed_multi_word_patch_is_logged_on_the_next_refresh(corpus, monkeypatch):
+    client = server.app.test_client()
+    version = client.get('/api/words/all').get_json()['version']
+    rule_id = server.store.get_word('6')['questions'][0]['ruleId']
+    result = flipped(server.store.get_word('6'), rule_id)
+    write = server.write_file_atomic
+    calls = []
+
+    def fail_second_write(filepath, raw):
+        calls.append(filepath)
+        if len(calls) == 2:
+            raise OSError("disk full")
+        write(filepath, raw)
+
+    monkeypatch.setattr(server, 'write_file_atomic', fail_second_write)
+    response = client.post('/api/cells', json={'baseVersion': version, 'cells': [
+        {'wordId': '6', 'ruleId': rule_id, 'result': result},
+        {'wordId': '7', 'ruleId': rule_id, 'result': True},
+    ]})
+    assert response.status_code == 500
+
+    # word_6.json was renamed into place before the failure; the log must catch up with it
+    with open(os.path.join(corpus['words'], 'word_6.json'), 'r', encoding='utf-8') as f:
+        assert flipped(json.load(f), rule_id) != result
+    delta = client.get(f'/api/changes?since={version}').get_json()
+    assert [(c['wordId'], c['ruleId'], c['result']) for c in delta['cells']] == [('6', rule_id, result)]
@@ -0,0 +1,52 @@
+"""
+Tests for the rule expression parser of the truth matrix.
+
+Run with:
+    python -m pytest -q tests
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'resources', 'data'))
+
+from truth_matrix import MAX_NESTING, TruthMatrix  # noqa: E402
+
+
+@pytest.fixture
+def matrix():
+    # Word n answers rule r true when bit r of n is set
+    return TruthMatrix.from_words([
+        {"id": str(n), "word": f"词{n}", "questions": [{"ruleId": r, "result": bool(n >> r & 1)} for r in range(3)]}
+        for n in range(1, 9)
+    ])
+
+
+@pytest.mark.parametrize("expression, ids", [
+    ("1", ["2", "3", "6", "7"]),
+    ("rule 1 AND NOT 0", ["2", "6"]),
+    ("1 && ~0 || 2", ["2", "4", "5", "6", "7"]),
+    ("not (0 or 1)", ["4", "8"]),
+    ("NOT NOT NOT (0 OR 1)", ["4", "8"]),
+])
+def test_expressions(matrix, expression, ids):
+    assert [w["id"] for w in matrix.query(expression)] == ids
+
+
+def test_long_not_chains_do_not_recurse(matrix):
+    assert matrix.count("NOT " * 5000 + "1") == matrix.count("1")
+    assert matrix.count("NOT " * 5001 + "1") == matrix.count("NOT 1")
+
+
+def test_deep_nesting_is_rejected(matrix):
+    assert matrix.count("(" * MAX_NESTING + "1" + ")" * MAX_NESTING) == 4
+    with pytest.raises(ValueError):
+        matrix.count("(" * 5000 + "1" + ")" * 5000)
+
+
+@pytest.mark.parametrize("expression", ["1 andnot 2", "1 ORrule 2", "notx 1", "1 AND", "(1", ""])
+def test_malformed_expressions_are_rejected(matrix, expression):
+    with pytest.raises(ValueError):
+        matrix.count(expression)
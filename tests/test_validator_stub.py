@@ -0,0 +1,245 @@
+"""
+Validator tests against a local stub of the chat completions API.
+
+The stub answers every rule listed in the system prompt (minus any it is told to
+omit), either as one JSON response or as a server-sent event stream, and can be
+scripted to return 429s or to drop a stream part way through.
+
+Run with:
+    python -m pytest -q tests
+"""
+
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'resources', 'data'))
+
+import validator  # noqa: E402
+
+RULES = [{"id": i, "text": f"规则 {i}"} for i in range(1, 31)]
+API_KEY = "test-key"
+
+
+def prompt_rule_ids(body):
+    """Rule ids embedded in the system prompt of a request body."""
+    prompt = body["messages"][0]["content"]
+    for line in prompt.splitlines():
+        if line.startswith('['):
+            return [r["id"] for r in json.loads(line)]
+    return []
+
+
+class StubAPI:
+    """Scripted completions server. Each entry of `script` handles one request;
+    once it runs out every request is answered normally."""
+
+    def __init__(self):
+        self.script = []
+        self.requests = []
+        self.omit = set()
+        self._lock = threading.Lock()
+
+    def answer_lines(self, body):
+        return [f"ruleId: {rule_id}, result: {'true' if rule_id % 2 else 'false'}, reason: 理由{rule_id}"
+                for rule_id in prompt_rule_ids(body) if rule_id not in self.omit]
+
+    def handle(self, handler, body):
+        with self._lock:
+            self.requests.append(body)
+            action = self.script.pop(0) if self.script else None
+        if action == 'rate_limit':
+            handler.send_response(429)
+            handler.send_header('Retry-After', '0.2')
+            handler.send_header('Content-Length', '0')
+            handler.end_headers()
+        elif body.get("stream"):
+            lines = self.answer_lines(body)
+            drop_after = action[1] if isinstance(action, tuple) and action[0] == 'drop' else None
+            self.send_stream(handler, lines, drop_after)
+        else:
+            raw = json.dumps({
+                "choices": [{"message": {"content": "\n".join(self.answer_lines(body))}}],
+                "usage": {"total_tokens": 10},
+            }).encode('utf-8')
+            handler.send_response(200)
+            handler.send_header('Content-Type', 'application/json')
+            handler.send_header('Content-Length', str(len(raw)))
+            handler.end_headers()
+            handler.wfile.write(raw)
+
+    @staticmethod
+    def send_stream(handler, lines, drop_after=None):
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/event-stream')
+        handler.send_header('Transfer-Encoding', 'chunked')
+        handler.end_headers()
+
+        def chunk(payload):
+            data = f"data: {payload}\n\n".encode('utf-8')
+            handler.wfile.write(f"{len(data):x}\r\n".encode('ascii') + data + b"\r\n")
+            handler.wfile.flush()
+
+        for i, line in enumerate(lines):
+            if drop_after is not None and i == drop_after:
+                # Half a line, then the connection goes away without the final chunk
+                chunk(json.dumps({"choices": [{"delta": {"content": line[:10]}}]}))
+                handler.close_connection = True
+                return
+            chunk(json.dumps({"choices": [{"delta": {"content": line + "\n"}}]}))
+        chunk(json.dumps({"choices": [], "usage": {"total_tokens": 10}}))
+        chunk('[DONE]')
+        handler.wfile.write(b"0\r\n\r\n")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.stub.handle(self, body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def stub():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    server.stub = StubAPI()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.stub.url = f"http://127.0.0.1:{server.server_address[1]}/v1/chat/completions"
+    yield server.stub
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def words_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(validator, 'get_all_rules', lambda db=None: RULES)
+    for word_id, word in enumerate(["山水", "日月", "花草"], start=1):
+        with open(tmp_path / f"word_{word_id}.json", 'w', encoding='utf-8') as f:
+            json.dump({"id": str(word_id), "word": word, "questions": []}, f, ensure_ascii=False)
+    return tmp_path
+
+
+def answered_ids(text):
+    return {q["ruleId"] for q in map(validator.parse_rule_line, text.splitlines()) if q}
+
+
+def test_rate_limit_waits_for_retry_after(stub, monkeypatch):
+    delays = []
+    monkeypatch.setattr(validator.CallTiming, 'backoff', lambda self, delay: delays.append(delay))
+    stub.script = ['rate_limit', 'rate_limit']
+
+    text = validator.validate_word("山水", API_KEY, RULES, api_url=stub.url)
+
+    assert delays == [0.2, 0.2]
+    assert len(stub.requests) == 3
+    assert answered_ids(text) == {r["id"] for r in RULES}
+
+
+def test_streamed_rate_limit_waits_for_retry_after(stub, monkeypatch):
+    delays = []
+    monkeypatch.setattr(validator.CallTiming, 'backoff', lambda self, delay: delays.append(delay))
+    stub.script = ['rate_limit']
+
+    text = validator.validate_word("山水", API_KEY, RULES, api_url=stub.url, stream=True)
+
+    assert delays == [0.2]
+    assert answered_ids(text) == {r["id"] for r in RULES}
+
+
+def test_bulk_run_resumes_from_journal(stub, words_dir):
+    journal_path = str(words_dir / "journal.jsonl")
+    signature = validator.run_signature([1, 2, 3], RULES, incremental=False, pack_words=1, shards=1,
+                                        stream=False, db=False)
+    journal = validator.ProgressJournal(journal_path, signature)
+    journal.record(1, 'ok')
+    journal.record(2, 'error', 'boom')
+
+    success, total = validator.validate_words_bulk([1, 2, 3], str(words_dir), API_KEY, workers=2,
+                                                   journal_path=journal_path, api_url=stub.url)
+
+    assert (success, total) == (3, 3)
+    assert sorted(body["messages"][1]["content"] for body in stub.requests) == ["日月", "花草"]
+    # A finished run removes its journal so the next run starts fresh
+    assert not os.path.exists(journal_path)
+    with open(words_dir / "word_3.json", 'r', encoding='utf-8') as f:
+        assert len(json.load(f)["questions"]) == len(RULES)
+
+
+def test_journal_from_a_different_run_is_not_resumed(stub, words_dir):
+    journal_path = str(words_dir / "journal.jsonl")
+    os.remove(words_dir / "word_3.json")
+    success, total = validator.validate_words_bulk([1, 2, 3], str(words_dir), API_KEY,
+                                                   journal_path=journal_path, api_url=stub.url)
+    assert (success, total) == (2, 3)
+    assert os.path.exists(journal_path)
+    stub.requests.clear()
+
+    success, total = validator.validate_words_bulk([1, 2], str(words_dir), API_KEY,
+                                                   journal_path=journal_path, api_url=stub.url)
+
+    assert (success, total) == (2, 2)
+    assert len(stub.requests) == 2
+
+
+def test_dropped_stream_resumes_with_missing_rules(stub, tmp_path):
+    progress_path = str(tmp_path / ".stream_test.jsonl")
+    stub.script = [('drop', 12)]
+
+    text = validator.validate_word_streaming("山水", API_KEY, RULES, api_url=stub.url,
+                                             progress_path=progress_path)
+
+    assert answered_ids(text) == {r["id"] for r in RULES}
+    assert len(stub.requests) == 2
+    # The second request only asks for the rules the dropped stream never finished
+    assert prompt_rule_ids(stub.requests[1]) == [r["id"] for r in RULES[12:]]
+
+
+def test_progress_file_resumes_after_restart(stub, tmp_path):
+    progress_path = str(tmp_path / ".stream_test.jsonl")
+    stub.script = [('drop', 5)]
+    validator.validate_word_streaming("山水", API_KEY, RULES, api_url=stub.url,
+                                      progress_path=progress_path, max_rounds=1)
+    assert len(validator.load_stream_progress(progress_path, "山水", RULES)) == 5
+
+    text = validator.validate_word_streaming("山水", API_KEY, RULES, api_url=stub.url,
+                                             progress_path=progress_path)
+
+    assert answered_ids(text) == {r["id"] for r in RULES}
+    assert prompt_rule_ids(stub.requests[-1]) == [r["id"] for r in RULES[5:]]
+
+
+def test_skipped_rules_are_rerequested_after_the_stream(stub):
+    stub.omit = set(range(10, 20))
+    plain = answered_ids(validator.validate_word("山水", API_KEY, RULES, api_url=stub.url))
+    stub.requests.clear()
+
+    streamed = answered_ids(validator.validate_word("山水", API_KEY, RULES, api_url=stub.url, stream=True))
+
+    assert streamed >= plain
+    assert streamed == {r["id"] for r in RULES} - stub.omit
+    # The first stream is read to the end; later rounds ask only for the skipped rules
+    assert prompt_rule_ids(stub.requests[1]) == list(range(10, 20))
+
+
+def test_skipped_rules_answered_on_a_later_round(stub):
+    stub.omit = set(range(10, 20))
+    answers = []
+
+    def answer_next_time(q):
+        answers.append(q)
+        if len(answers) == len(RULES) - 10:
+            stub.omit = set()
+
+    text = validator.validate_word_streaming("山水", API_KEY, RULES, api_url=stub.url, on_result=answer_next_time)
+
+    assert answered_ids(text) == {r["id"] for r in RULES}
+    assert len(stub.requests) == 2